@@ -0,0 +1,26 @@
+"""Point the global config at config.sample.yaml with a throwaway storage dir.
+
+Import this before any module that reads envs.
+"""
+
+import tempfile
+from pathlib import Path
+
+import yaml
+
+from config import get_config
+
+ROOT = Path(__file__).resolve().parent.parent
+
+with open(ROOT / "config.sample.yaml", "r", encoding="utf-8") as f:
+    _config = yaml.safe_load(f)
+
+STORAGE_DIRECTORY = Path(tempfile.mkdtemp(prefix="raiffeisen-bench-"))
+_config["storage"]["directory"] = str(STORAGE_DIRECTORY)
+_config["email"]["fetch_mode"] = "full"
+
+CONFIG_PATH = STORAGE_DIRECTORY / "config.yaml"
+with open(CONFIG_PATH, "w", encoding="utf-8") as f:
+    yaml.safe_dump(_config, f, allow_unicode=True)
+
+config = get_config(str(CONFIG_PATH))
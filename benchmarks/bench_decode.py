@@ -0,0 +1,38 @@
+"""Decode a /v8/diff/ response into full models vs ZenMoneyStateSummary.
+
+Usage: PYTHONPATH=src python benchmarks/bench_decode.py [count ...]
+"""
+
+import json
+import sys
+import time
+
+import bench_config  # noqa: F401  (must be imported before envs users)
+from synthetic import state_json_chunks
+
+from services.zen_money.zen_money_api import ZenMoneyState, ZenMoneyStateSummary
+
+
+def measure(func) -> float:
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+
+    for count in counts:
+        body = b"".join(state_json_chunks(count))
+
+        full = measure(lambda: ZenMoneyState.model_validate(json.loads(body)))
+        summary = measure(lambda: ZenMoneyStateSummary.model_validate_json(body))
+
+        print(
+            f"{count:>7} transactions: full models {full * 1000:8.1f} ms, "
+            f"summary {summary * 1000:8.1f} ms (x{full / summary:.1f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
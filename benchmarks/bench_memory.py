@@ -0,0 +1,86 @@
+"""Memory used per parsed operation: plain dataclasses vs slotted ones.
+
+The "before" layout is the original RawOperation (per-instance __dict__,
+float amount, dd.mm.yyyy date string), parsed from the same XML.
+
+Usage: PYTHONPATH=src python benchmarks/bench_memory.py [count ...]
+"""
+
+import gc
+import io
+import sys
+import tracemalloc
+from dataclasses import dataclass
+
+from lxml import etree  # pyright: ignore
+from synthetic import generate_statements, statement_xml
+
+from services.emails_statements.statement import Statement
+
+
+@dataclass
+class LegacyRawOperation:
+    customer: str
+    amount: float
+    currency: str
+    reference: str
+    data: str
+    description: str
+
+
+def parse_legacy(xml: bytes, currency: str) -> list[LegacyRawOperation]:
+    operations = []
+    for _event, element in etree.iterparse(io.BytesIO(xml), tag="Stavke"):
+        attrib = element.attrib
+        if attrib.get("Duguje", "0") != "0":
+            amount = -float(attrib.get("Duguje"))
+        else:
+            amount = float(attrib.get("Potrazuje"))
+        operations.append(
+            LegacyRawOperation(
+                customer=attrib.get("NalogKorisnik", ""),
+                amount=amount,
+                currency=currency,
+                data=attrib.get("DatumValute", ""),
+                reference=attrib.get("Referenca", ""),
+                description=attrib.get("Opis", ""),
+            )
+        )
+        element.clear()
+    return operations
+
+
+def parse_current(xml: bytes, _currency: str) -> list:
+    return Statement.from_xml(xml).operations
+
+
+def retained_bytes(parse, xmls: list[tuple[bytes, str]]) -> tuple[int, int]:
+    gc.collect()
+    tracemalloc.start()
+    operations = [operation for xml in xmls for operation in parse(*xml)]
+    gc.collect()
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, len(operations)
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+
+    for count in counts:
+        rsd, usd = generate_statements(count)
+        xmls = [(statement_xml(rsd, "RSD"), "RSD"), (statement_xml(usd, "USD"), "USD")]
+
+        legacy_bytes, operations = retained_bytes(parse_legacy, xmls)
+        current_bytes, _ = retained_bytes(parse_current, xmls)
+
+        print(
+            f"{operations:>7} operations: "
+            f"dataclass {legacy_bytes / operations:7.1f} B/op, "
+            f"slotted {current_bytes / operations:7.1f} B/op "
+            f"(-{100 - current_bytes * 100 / legacy_bytes:.0f}%)"
+        )
+
+
+if __name__ == "__main__":
+    main()
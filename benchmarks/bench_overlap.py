@@ -0,0 +1,65 @@
+"""Sequential vs overlapped statement + ZenMoney state download.
+
+Runs against local stand-ins with artificial latency:
+PYTHONPATH=src python benchmarks/bench_overlap.py [imap_delay] [http_delay]
+"""
+
+import sys
+import time
+
+import bench_config  # noqa: F401  (must be imported before envs users)
+from stubs import FakeIMAPClient, serve_zen_money
+from synthetic import (
+    generate_statements,
+    state_json_chunks,
+    statement_mail,
+    statement_xml,
+)
+
+import pipeline
+from services.emails_statements import getter
+from services.zen_money import zen_money_api
+
+DAYS = 7
+
+
+def sequential():
+    operations = pipeline.prepare(getter.get_statements(DAYS))
+    zen_money_state = pipeline.load_state(DAYS)
+    return operations, zen_money_state
+
+
+def main():
+    imap_delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.3
+    http_delay = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+
+    statements = generate_statements(2_000)
+    currencies = ["RSD", "USD"]
+    messages = {
+        uid: statement_mail(statement_xml(statements[uid % 2], currencies[uid % 2]))
+        for uid in range(1, 41)
+    }
+    getter.connect = lambda *credentials: FakeIMAPClient(messages, delay=imap_delay)
+
+    url, server = serve_zen_money(lambda: state_json_chunks(20_000), delay=http_delay)
+    zen_money_api.API_URL = url
+
+    results = {}
+    for name, run in [
+        ("sequential", sequential),
+        ("overlapped", lambda: pipeline.fetch_and_prepare(DAYS)),
+    ]:
+        started = time.perf_counter()
+        operations, zen_money_state = run()
+        results[name] = time.perf_counter() - started
+        print(
+            f"{name}: {results[name]:.2f} s "
+            f"({len(operations)} operations, {len(zen_money_state.transaction)} transactions)"
+        )
+
+    server.shutdown()
+    print(f"speedup: x{results['sequential'] / results['overlapped']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare indexed exchange pairing with the original pairwise scan.
+
+Usage: PYTHONPATH=src python benchmarks/bench_pairing.py [count ...]
+"""
+
+import sys
+import time
+
+from synthetic import generate_statements
+
+from services.operations.classifier import OperationClassifier
+from services.operations.operations import TransitionOperation
+from services.operations.preparer import (
+    _are_operations_linked,
+    _is_exchange_pair,
+    _pair_currency_exchanges,
+)
+
+
+def pair_quadratic(raw_operations, exchange_flags):
+    transition_operations = []
+    processed_operations = set()
+
+    for i, op1 in enumerate(raw_operations):
+        if i in processed_operations:
+            continue
+
+        for j, op2 in enumerate(raw_operations[i + 1 :], i + 1):
+            if j in processed_operations:
+                continue
+
+            if _are_operations_linked(op1, op2) and _is_exchange_pair(
+                op1, op2, exchange_flags[i] or exchange_flags[j]
+            ):
+                if op1.amount_minor < 0:
+                    from_op, to_op = op1, op2
+                else:
+                    from_op, to_op = op2, op1
+
+                transition_operations.append(
+                    TransitionOperation.from_raw(from_op, to_op)
+                )
+                processed_operations.add(i)
+                processed_operations.add(j)
+                break
+
+    return transition_operations, processed_operations
+
+
+def measure(func, raw_operations, exchange_flags):
+    started = time.perf_counter()
+    result = func(raw_operations, exchange_flags)
+    return result, time.perf_counter() - started
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 5_000, 10_000]
+
+    for count in counts:
+        raw_operations = [
+            operation
+            for statement in generate_statements(count)
+            for operation in statement.operations
+        ]
+
+        classifier = OperationClassifier()
+        exchange_flags = [
+            classifier.classify(operation).exchange for operation in raw_operations
+        ]
+
+        indexed, indexed_time = measure(
+            _pair_currency_exchanges, raw_operations, exchange_flags
+        )
+        quadratic, quadratic_time = measure(
+            pair_quadratic, raw_operations, exchange_flags
+        )
+
+        if indexed != quadratic:
+            raise AssertionError(f"Pairing results differ for {count} operations")
+
+        print(
+            f"{count:>7} operations, {len(indexed[0]):>6} exchanges: "
+            f"indexed {indexed_time * 1000:9.1f} ms, "
+            f"quadratic {quadratic_time * 1000:9.1f} ms "
+            f"(x{quadratic_time / indexed_time:.0f})"
+        )
+
+
+if __name__ == "__main__":
+    main()
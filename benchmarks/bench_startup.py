@@ -0,0 +1,80 @@
+"""Startup cost of small invocations, measured with `python -X importtime`.
+
+Every command runs in a fresh interpreter against a copy of src/ next to
+a config made from config.sample.yaml, the way the Docker image runs it.
+Reported are the median wall time, the total import time and which of
+the heavy dependencies got imported.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["imapclient", "mailparser", "lxml", "pydantic", "requests", "yaml"]
+
+COMMANDS = {
+    # What the Docker HEALTHCHECK used to run
+    "import main": ["-c", "import main"],
+    "cli.py --help": ["cli.py", "--help"],
+    "cli.py healthcheck": ["cli.py", "healthcheck"],
+}
+
+
+def measure(src: Path, args: list[str]) -> tuple[float, float, list[str]]:
+    """Wall time (s), import time (s) and heavy modules of one run"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=src,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - started
+
+    # import time: self [us] | cumulative | imported package
+    import_us = 0
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        import_us += int(self_us)
+        imported.add(name.strip().split(".")[0])
+
+    return elapsed, import_us / 1e6, [m for m in HEAVY_MODULES if m in imported]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        src = directory / "src"
+        shutil.copytree(ROOT / "src", src, ignore=shutil.ignore_patterns("__pycache__"))
+        shutil.copy(ROOT / "config.sample.yaml", directory / "config.yaml")
+
+        for name, args in COMMANDS.items():
+            # Первый запуск компилирует .pyc, его не считаем
+            measure(src, args)
+            results = [measure(src, args) for _ in range(runs)]
+
+            wall = statistics.median(elapsed for elapsed, _, _ in results)
+            imports = statistics.median(seconds for _, seconds, _ in results)
+            heavy = ", ".join(results[-1][2]) or "-"
+            print(
+                f"{name:>20}: {wall * 1000:6.1f} ms wall, "
+                f"{imports * 1000:6.1f} ms imports; heavy: {heavy}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Peak memory of loading a large /v8/diff/ response: buffered vs streamed.
+
+Every mode runs in a fresh subprocess against a local stub serving
+synthetic transactions; the reported number is the peak RSS growth
+over the process state right before the download.
+
+Usage: PYTHONPATH=src python benchmarks/bench_stream.py [transactions]
+"""
+
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+MODES = ["buffered", "summary", "store"]
+
+
+def run_mode(mode: str, url: str) -> None:
+    import requests
+
+    import bench_config  # noqa: F401  (must be imported before envs users)
+
+    from services.zen_money import zen_money_api
+    from services.zen_money.state_store import ZenMoneyStateStore
+
+    zen_money_api.API_URL = url
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+
+    if mode == "buffered":
+        # The original path: whole body, r.json() dict, full models
+        r = requests.post(url, json={"serverTimestamp": 0}, timeout=600)
+        transactions = len(
+            zen_money_api.ZenMoneyState.model_validate(r.json()).transaction
+        )
+    elif mode == "summary":
+        transactions = len(zen_money_api.get_state(7).transaction)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            with ZenMoneyStateStore(Path(directory)) as store:
+                zen_money_api.sync_state(store, 7)
+                transactions = store._connection.execute(
+                    "SELECT COUNT(*) FROM transactions"
+                ).fetchone()[0]
+
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f"{mode:>8}: {transactions} transactions, {elapsed:6.1f} s, "
+        f"peak +{(peak - before) / 1024:7.1f} MB"
+    )
+
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "--mode":
+        run_mode(sys.argv[2], sys.argv[3])
+        return
+
+    from stubs import serve_zen_money
+    from synthetic import state_json_chunks
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    url, server = serve_zen_money(lambda: state_json_chunks(count))
+
+    for mode in MODES:
+        subprocess.run([sys.executable, __file__, "--mode", mode, url], check=True)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
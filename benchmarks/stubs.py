@@ -0,0 +1,70 @@
+"""Local stand-ins for Gmail IMAP and the ZenMoney API."""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterable
+
+
+class FakeIMAPClient:
+    """Serves RFC822 messages from memory, sleeping `delay` per round trip"""
+
+    def __init__(self, messages: dict[int, bytes], delay: float = 0.0):
+        self._messages = messages
+        self._delay = delay
+
+    def select_folder(self, folder: str, readonly: bool = False) -> dict:
+        time.sleep(self._delay)
+        return {b"UIDVALIDITY": 1, b"EXISTS": len(self._messages)}
+
+    def search(self, criteria) -> list[int]:
+        time.sleep(self._delay)
+        return sorted(self._messages)
+
+    def fetch(self, messages: list[int], data) -> dict:
+        time.sleep(self._delay)
+        return {uid: {b"RFC822": self._messages[uid]} for uid in messages}
+
+    def logout(self) -> None:
+        pass
+
+
+def serve_zen_money(
+    body: Callable[[], Iterable[bytes]], delay: float = 0.0
+) -> tuple[str, ThreadingHTTPServer]:
+    """Start a local /v8/diff/ stub answering every POST with body()
+
+    The body is streamed in chunks (chunked transfer encoding), so
+    arbitrarily large payloads do not have to fit in memory.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(delay)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in body():
+                if chunk:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+
+    server = _QuietHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/v8/diff/", server
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients of benchmarks exit without closing keep-alive connections
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
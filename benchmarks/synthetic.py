@@ -0,0 +1,334 @@
+"""Synthetic Raiffeisen statements for benchmarks."""
+
+import json
+import random
+from datetime import date, timedelta
+from email.message import EmailMessage
+from typing import Iterator
+
+from lxml import etree  # pyright: ignore
+
+from services.emails_statements.statement import (
+    RawOperation,
+    Statement,
+    format_date,
+    to_minor_units,
+)
+from services.operations.operations import (
+    CashWithdrawalOperation,
+    DeelTransferOperation,
+    TransitionOperation,
+)
+
+CUSTOMERS = [
+    "HERMES AGENCIJA",
+    "JKP INFORMATIKA NOVI SAD",
+    "Novi Sad - Gas",
+    "Poreska Uprava",
+    "MAXI 123 NOVI SAD",
+    "LIDL SRBIJA KD",
+    "DEEL INC",
+    "RAIFFEISEN BANK SRB ATM",
+]
+
+
+def generate_statements(
+    operations_count: int,
+    exchange_ratio: float = 0.2,
+    seed: int = 42,
+    start: date = date(2024, 1, 1),
+) -> list[Statement]:
+    """Generate a dinar and a foreign currency statement with linked exchanges.
+
+    About `exchange_ratio` of the operations are exchange legs; half of the
+    pairs share a reference, the other half mention it in the description.
+    """
+    rng = random.Random(seed)
+    rsd_operations = []
+    usd_operations = []
+    reference_counter = 1_000_000_000
+
+    def next_reference() -> str:
+        nonlocal reference_counter
+        reference_counter += rng.randint(1, 17)
+        return str(reference_counter)
+
+    while len(rsd_operations) + len(usd_operations) < operations_count:
+        day = (start + timedelta(days=rng.randint(0, 364))).toordinal()
+
+        if rng.random() < exchange_ratio:
+            usd_amount = round(rng.uniform(10, 2000), 2)
+            rsd_amount = round(usd_amount * 117.2, 2)
+            usd_reference = next_reference()
+            if rng.random() < 0.5:
+                rsd_reference = usd_reference
+                description = "Kupoprodaja deviza po kursu 117,2"
+            else:
+                rsd_reference = next_reference()
+                description = f"Dinarska protivvrednost za nalog {usd_reference}"
+
+            usd_operations.append(
+                RawOperation(
+                    customer="Raiffeisen banka a.d.",
+                    amount_minor=-to_minor_units(usd_amount),
+                    currency="USD",
+                    reference=usd_reference,
+                    date_ordinal=day,
+                    description="Otkup deviza",
+                )
+            )
+            rsd_operations.append(
+                RawOperation(
+                    customer="Raiffeisen banka a.d.",
+                    amount_minor=to_minor_units(rsd_amount),
+                    currency="RSD",
+                    reference=rsd_reference,
+                    date_ordinal=day,
+                    description=description,
+                )
+            )
+        else:
+            customer = rng.choice(CUSTOMERS)
+            amount = round(rng.uniform(100, 25_000), 2)
+            rsd_operations.append(
+                RawOperation(
+                    customer=customer,
+                    amount_minor=(
+                        to_minor_units(amount)
+                        if customer == "DEEL INC"
+                        else -to_minor_units(amount)
+                    ),
+                    currency="RSD",
+                    reference=next_reference(),
+                    date_ordinal=day,
+                    description=(
+                        f"Placanje {customer} ******1234"
+                        if "ATM" in customer
+                        else f"Placanje {customer}"
+                    ),
+                )
+            )
+
+    return [
+        Statement(account_number="265000000000000001", operations=rsd_operations),
+        Statement(account_number="265000000000000002", operations=usd_operations),
+    ]
+
+
+def statement_xml(statement: Statement, currency: str) -> bytes:
+    """Render a statement the way Raiffeisen XML attachments look"""
+    root = etree.Element("IzvodRacuna")
+    etree.SubElement(
+        root, "Zaglavlje", Partija=statement.account_number, OznakaValute=currency
+    )
+    for operation in statement.operations:
+        etree.SubElement(
+            root,
+            "Stavke",
+            NalogKorisnik=operation.customer,
+            Duguje=f"{-operation.amount:.2f}" if operation.amount < 0 else "0",
+            Potrazuje=f"{operation.amount:.2f}" if operation.amount > 0 else "0",
+            DatumValute=format_date(operation.date_ordinal),
+            Referenca=operation.reference,
+            Opis=operation.description,
+        )
+    return etree.tostring(root, encoding="utf-8")
+
+
+def statement_mail(
+    xml: bytes, subject: str = "Izvod po dinarskom racunu broj"
+) -> bytes:
+    """RFC822 statement mail with an HTML body, a PDF copy and the XML"""
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = "RaiffeisenOnline@raiffeisenbank.rs"
+    message.set_content("<html><body>Izvod</body></html>", subtype="html")
+    message.add_attachment(
+        b"%PDF-1.4" + bytes(20_000), "application", "pdf", filename="izvod.pdf"
+    )
+    message.add_attachment(xml, "application", "xml", filename="izvod.xml")
+    return message.as_bytes()
+
+
+INSTRUMENTS = [(1, "USD"), (12229, "RSD"), (3, "EUR")]
+ACCOUNTS = [
+    ("00000000-0000-0000-0000-000000000001", 1, "Raiffeizen Banka USD"),
+    ("00000000-0000-0000-0000-000000000002", 12229, "Raiffeizen Banka RSD"),
+    ("00000000-0000-0000-0000-000000000003", 12229, "Cash"),
+]
+# Currency -> Raiffeisen account id and instrument id
+CURRENCY_ACCOUNTS = {"USD": ACCOUNTS[0][:2], "RSD": ACCOUNTS[1][:2]}
+
+
+def state_json_chunks(
+    transactions_count: int, seed: int = 42, chunk_size: int = 1_000
+) -> Iterator[bytes]:
+    """Yield a /v8/diff/ response body with synthetic transactions in chunks"""
+    rng = random.Random(seed)
+
+    yield json.dumps(_state_header())[:-1].encode() + b', "transaction": ['
+
+    for start in range(0, transactions_count, chunk_size):
+        end = min(start + chunk_size, transactions_count)
+        batch = ",".join(
+            json.dumps(_transaction(rng, number), ensure_ascii=False)
+            for number in range(start, end)
+        )
+        yield (("," if start else "") + batch).encode()
+
+    yield b"]}"
+
+
+def generate_state(
+    operations: list,
+    imported_ratio: float = 0.5,
+    transactions_count: int = 0,
+    seed: int = 42,
+) -> dict:
+    """Build a /v8/diff/ response in which some operations are already imported.
+
+    About `imported_ratio` of the prepared operations have a transaction:
+    half of them under the deterministic import id, the other half as
+    imported before ids existed, found by date, amount and comment.
+    `transactions_count` unrelated transactions are added on top.
+    """
+    rng = random.Random(seed)
+    transactions = [_transaction(rng, number) for number in range(transactions_count)]
+
+    for operation in operations:
+        if rng.random() < imported_ratio:
+            transaction = _imported_transaction(operation, len(transactions))
+            if rng.random() < 0.5:
+                transaction["id"] = operation.import_id
+            transactions.append(transaction)
+
+    return {**_state_header(), "transaction": transactions}
+
+
+def _state_header() -> dict:
+    return {
+        "serverTimestamp": 1_700_000_000,
+        "instrument": [
+            {
+                "id": instrument_id,
+                "title": title,
+                "shortTitle": title,
+                "symbol": title,
+                "rate": 1.0,
+                "changed": 0,
+            }
+            for instrument_id, title in INSTRUMENTS
+        ],
+        "account": [_account(*account) for account in ACCOUNTS],
+        "reminderMarker": [],
+    }
+
+
+def _account(account_id: str, instrument_id: int, title: str) -> dict:
+    return {
+        "id": account_id,
+        "user": 1234567,
+        "instrument": instrument_id,
+        "type": "checking",
+        "role": None,
+        "private": False,
+        "savings": False,
+        "title": title,
+        "inBalance": True,
+        "creditLimit": 0,
+        "startBalance": 0,
+        "balance": 0,
+        "company": None,
+        "archive": False,
+        "enableCorrection": False,
+        "balanceCorrectionType": "request",
+        "changed": 0,
+        "enableSMS": False,
+    }
+
+
+def _transaction(rng: random.Random, number: int) -> dict:
+    account_id, instrument_id, _title = rng.choice(ACCOUNTS[:2])
+    customer = rng.choice(CUSTOMERS)
+    amount = round(rng.uniform(100, 25_000), 2)
+    is_income = customer == "DEEL INC"
+    day = date(2020, 1, 1) + timedelta(days=rng.randint(0, 5 * 365))
+
+    return {
+        "id": f"{number:08x}-0000-4000-8000-000000000000",
+        "user": 1234567,
+        "date": day.isoformat(),
+        "income": amount if is_income else 0,
+        "outcome": 0 if is_income else amount,
+        "changed": 1_600_000_000 + number,
+        "incomeInstrument": instrument_id,
+        "outcomeInstrument": instrument_id,
+        "created": 1_600_000_000 + number,
+        "originalPayee": None,
+        "deleted": False,
+        "viewed": True,
+        "hold": False,
+        "qrCode": None,
+        "source": None,
+        "incomeAccount": account_id if is_income else ACCOUNTS[2][0],
+        "outcomeAccount": ACCOUNTS[2][0] if is_income else account_id,
+        "tag": [],
+        "comment": f"Импорт: {customer} (RSD)",
+        "payee": customer,
+        "opIncome": None,
+        "opOutcome": None,
+        "opIncomeInstrument": None,
+        "opOutcomeInstrument": None,
+        "latitude": None,
+        "longitude": None,
+        "merchant": None,
+        "incomeBankID": None,
+        "outcomeBankID": None,
+        "reminderMarker": None,
+    }
+
+
+def _imported_transaction(operation, number: int) -> dict:
+    """Transaction an earlier import created for a prepared operation"""
+    cash_account_id = ACCOUNTS[2][0]
+
+    if isinstance(operation, TransitionOperation):
+        outcome_account, outcome_instrument = CURRENCY_ACCOUNTS[operation.from_currency]
+        income_account, income_instrument = CURRENCY_ACCOUNTS[operation.to_currency]
+        outcome = abs(operation.from_amount)
+        income = abs(operation.to_amount)
+        comment = (
+            f"Обмен валют: {operation.from_amount} {operation.from_currency}"
+            f" → {operation.to_amount} {operation.to_currency}"
+        )
+        payee = None
+    else:
+        account_id, instrument_id = CURRENCY_ACCOUNTS[operation.currency]
+        income_instrument = outcome_instrument = instrument_id
+        if operation.amount > 0:
+            income, outcome = operation.amount, 0
+            income_account, outcome_account = account_id, cash_account_id
+        else:
+            income, outcome = 0, -operation.amount
+            income_account, outcome_account = cash_account_id, account_id
+
+        if isinstance(operation, DeelTransferOperation):
+            comment = f"Transfer from Deel: {operation.customer}"
+        elif isinstance(operation, CashWithdrawalOperation):
+            comment = f"Снятие наличных: {operation.customer}"
+        else:
+            comment = f"Импорт: {operation.customer} ({operation.currency})"
+        payee = operation.customer
+
+    return {
+        **_transaction(random.Random(number), number),
+        "date": operation.date,
+        "income": income,
+        "outcome": outcome,
+        "incomeInstrument": income_instrument,
+        "outcomeInstrument": outcome_instrument,
+        "incomeAccount": income_account,
+        "outcomeAccount": outcome_account,
+        "comment": comment,
+        "payee": payee,
+    }
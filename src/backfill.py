@@ -0,0 +1,119 @@
+"""Import a historical date range of statements window by window.
+
+Usage: python cli.py backfill START [END] [--window-days N] [--profile NAME]
+
+Each window is fetched, prepared, filtered and pushed on its own, so
+memory and request sizes do not grow with the length of the range.
+Progress is checkpointed after every window and an interrupted backfill
+of the same range resumes where it stopped.
+"""
+
+import json
+from datetime import date, timedelta
+from pathlib import Path
+
+from config import Profile
+from envs import BACKFILL_WINDOW_DAYS, DEFAULT_PROFILE
+from pipeline import create_statement_cache, import_statements, open_import_index
+from services.emails_statements.getter import connect, fetch_statements
+from services.zen_money.state_store import ZenMoneyStateStore
+from services.zen_money.zen_money_api import sync_state
+
+CHECKPOINT_FILENAME = "backfill.json"
+
+# Statement value dates may differ from the mail date by a few days
+STATE_MARGIN = timedelta(days=7)
+
+
+def backfill(
+    start: date,
+    end: date,
+    window_days: int = BACKFILL_WINDOW_DAYS,
+    profile: Profile = DEFAULT_PROFILE,
+) -> None:
+    if window_days < 1:
+        raise ValueError(f"Окно должно быть не меньше одного дня: {window_days}")
+
+    checkpoint_path = profile.storage_directory / CHECKPOINT_FILENAME
+
+    completed_until = _load_checkpoint(checkpoint_path, start, end)
+    if completed_until:
+        print(f"Продолжаем импорт после {completed_until.isoformat()}")
+        window_start = completed_until + timedelta(days=1)
+    else:
+        window_start = start
+
+    cache = create_statement_cache(profile)
+    import_index = open_import_index(profile)
+    server = connect(profile.email_username, profile.email_password)
+
+    try:
+        with ZenMoneyStateStore(profile.storage_directory) as store:
+            state_days = (date.today() - start + STATE_MARGIN).days
+
+            while window_start <= end:
+                window_end = min(window_start + timedelta(days=window_days - 1), end)
+                print(f"\nОкно {window_start.isoformat()} - {window_end.isoformat()}")
+
+                statements = fetch_statements(
+                    server,
+                    cache=cache,
+                    since=window_start,
+                    before=window_end + timedelta(days=1),
+                )
+                print(f"Получено выписок: {len(statements)}")
+
+                # Синхронизация дешевая: после первого окна приходит только дельта,
+                # включая операции, отправленные в предыдущем окне
+                sync_state(store, state_days, profile.zen_money_api_key)
+                zen_money_state = store.load(
+                    (window_start - STATE_MARGIN).isoformat(),
+                    (window_end + STATE_MARGIN).isoformat(),
+                )
+
+                import_statements(statements, zen_money_state, import_index, profile)
+
+                _save_checkpoint(checkpoint_path, start, end, window_end)
+                window_start = window_end + timedelta(days=1)
+    finally:
+        server.logout()
+
+    checkpoint_path.unlink(missing_ok=True)
+    print("\nИмпорт за период завершен")
+
+
+def _load_checkpoint(path: Path, start: date, end: date) -> date | None:
+    if not path.exists():
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+
+    # Чекпоинт другого периода не используем
+    if checkpoint["start"] != start.isoformat() or checkpoint["end"] != end.isoformat():
+        return None
+
+    return date.fromisoformat(checkpoint["completed_until"])
+
+
+def _save_checkpoint(path: Path, start: date, end: date, completed_until: date) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "completed_until": completed_until.isoformat(),
+            },
+            f,
+        )
+    tmp_path.replace(path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from cli import main
+
+    sys.exit(main(["backfill", *sys.argv[1:]]))
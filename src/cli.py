@@ -0,0 +1,196 @@
+"""Command line entry point.
+
+Usage: python cli.py {run,dry-run,plan,apply,backfill,daemon,healthcheck} ...
+
+Commands import what they need when they run: `--help` loads nothing
+but argparse, and healthcheck reads the config without loading the
+IMAP, XML, HTTP or pydantic code.
+"""
+
+import argparse
+import json
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    from config import Profile
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("run", help="import new statements of every profile")
+    commands.add_parser(
+        "dry-run", help="show what run would import, without changing anything"
+    )
+
+    plan = commands.add_parser(
+        "plan", help="save what run would import to a JSON/NDJSON file"
+    )
+    plan.add_argument("path", type=Path)
+    plan.add_argument("--profile")
+
+    apply = commands.add_parser("apply", help="push a plan saved by plan")
+    apply.add_argument("path", type=Path)
+
+    backfill = commands.add_parser(
+        "backfill", help="import a historical date range window by window"
+    )
+    backfill.add_argument("start", type=date.fromisoformat)
+    backfill.add_argument(
+        "end", type=date.fromisoformat, nargs="?", default=date.today()
+    )
+    backfill.add_argument("--window-days", type=_positive_int)
+    backfill.add_argument("--profile")
+
+    daemon = commands.add_parser(
+        "daemon", help="stay up and import statements as soon as they arrive"
+    )
+    daemon.add_argument("--profile")
+
+    healthcheck = commands.add_parser(
+        "healthcheck", help="check the config and the storage directories"
+    )
+    healthcheck.add_argument(
+        "--max-age",
+        type=int,
+        help="also fail when the last successful run is older (seconds)",
+    )
+
+    args = parser.parse_args(argv)
+    handlers = {
+        "run": _run,
+        "dry-run": _dry_run,
+        "plan": _plan,
+        "apply": _apply,
+        "backfill": _backfill,
+        "daemon": _daemon,
+        "healthcheck": _healthcheck,
+    }
+    return handlers[args.command](args) or 0
+
+
+def _run(args: argparse.Namespace) -> None:
+    from main import main as run
+
+    run()
+
+
+def _dry_run(args: argparse.Namespace) -> None:
+    from main import main as run
+
+    run(dry_run=True)
+
+
+def _plan(args: argparse.Namespace) -> None:
+    from plan import create_plan
+
+    create_plan(args.path, _find_profile(args.profile))
+
+
+def _apply(args: argparse.Namespace) -> None:
+    from plan import apply_plan
+
+    _with_metrics(lambda: apply_plan(args.path))
+
+
+def _backfill(args: argparse.Namespace) -> None:
+    from backfill import backfill
+    from envs import BACKFILL_WINDOW_DAYS
+
+    profile = _find_profile(args.profile)
+    window_days = (
+        args.window_days if args.window_days is not None else BACKFILL_WINDOW_DAYS
+    )
+    _with_metrics(lambda: backfill(args.start, args.end, window_days, profile))
+
+
+def _daemon(args: argparse.Namespace) -> None:
+    import signal
+
+    from daemon import run_daemon
+
+    profile = _find_profile(args.profile)
+    # docker stop sends SIGTERM - exit through the cleanup in run_daemon
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    run_daemon(profile)
+
+
+def _healthcheck(args: argparse.Namespace) -> int:
+    from config import get_config
+
+    try:
+        config = get_config()
+        for profile in config.profiles:
+            if not profile.email_username or not profile.zen_money_api_key:
+                raise ValueError(
+                    f"профиль {profile.name}: не заданы почта или ключ ZenMoney"
+                )
+            profile.storage_directory.mkdir(parents=True, exist_ok=True)
+
+        if args.max_age is not None:
+            _check_last_run(config.metrics_jsonl_file, args.max_age)
+    except Exception as e:
+        print(f"FAIL: {e}")
+        return 1
+
+    print("OK")
+    return 0
+
+
+def _check_last_run(jsonl_path: Path | None, max_age: int) -> None:
+    """Fail unless the last run recorded in the metrics file succeeded recently"""
+    if jsonl_path is None:
+        raise ValueError("metrics.jsonl_file не задан, возраст запуска неизвестен")
+
+    with open(jsonl_path, "rb") as f:
+        # Последний запуск - в последних строках, весь файл не читаем
+        f.seek(0, 2)
+        f.seek(max(0, f.tell() - 4096))
+        last_record = json.loads(f.read().splitlines()[-1])
+
+    finished = datetime.fromisoformat(last_record["time"])
+    age = (datetime.now(timezone.utc) - finished).total_seconds()
+    if last_record["status"] != "ok":
+        raise RuntimeError(f"последний запуск завершился ошибкой ({finished})")
+    if age > max_age:
+        raise RuntimeError(f"последний запуск был {age:.0f} с назад")
+
+
+def _with_metrics(run: Callable[[], object]) -> None:
+    """Time run as the "run" stage and write the metrics out, also on failure"""
+    import metrics
+    from envs import METRICS_JSONL_FILE, METRICS_PROMETHEUS_FILE
+
+    status = "error"
+    try:
+        with metrics.stage("run"):
+            run()
+        status = "ok"
+    finally:
+        metrics.emit(METRICS_JSONL_FILE, METRICS_PROMETHEUS_FILE, status)
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"должно быть не меньше 1: {value}")
+    return number
+
+
+def _find_profile(name: str | None) -> "Profile":
+    from envs import DEFAULT_PROFILE, PROFILES
+
+    if name is None:
+        return DEFAULT_PROFILE
+    for profile in PROFILES:
+        if profile.name == name:
+            return profile
+    raise SystemExit(f"Неизвестный профиль: {name}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
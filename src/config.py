@@ -1,9 +1,30 @@
+from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
 from typing import Any, Dict
 
 import yaml
 
 
+@dataclass(frozen=True, eq=False)
+class Profile:
+    """One mailbox imported into one ZenMoney user.
+
+    Compared and hashed by identity, so per-profile caches can key on it.
+    """
+
+    name: str
+    email_username: str
+    email_password: str
+    zen_money_api_key: str
+    zen_money_user_id: int
+    storage_directory: Path
+    currency_config: Dict[str, Any]
+    category_config: Dict[str, str]
+    deel_config: Dict[str, Any]
+    cash_withdrawal_config: Dict[str, Any]
+
+
 class Config:
     """Configuration manager for loading and accessing YAML configuration."""
 
@@ -23,6 +44,7 @@ class Config:
         if not config_path.exists():
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
 
+        self._path = config_path
         self._config = self._load_yaml(config_path)
 
     @staticmethod
@@ -42,18 +64,8 @@ class Config:
         Returns:
             Configuration value or default
         """
-        keys = key.split(".")
-        value = self._config
-
-        for k in keys:
-            if isinstance(value, dict):
-                value = value.get(k)
-                if value is None:
-                    return default
-            else:
-                return default
-
-        return value
+        value = _lookup(self._config, key)
+        return default if value is None else value
 
     @property
     def email_username(self) -> str:
@@ -70,6 +82,21 @@ class Config:
         """Get allowed email subjects."""
         return self.get("email.allowed_subjects", [])
 
+    @property
+    def email_fetch_mode(self) -> str:
+        """Get IMAP fetch mode: "full" messages or only XML "parts"."""
+        return self.get("email.fetch_mode", "full")
+
+    @property
+    def email_parse_workers(self) -> int:
+        """Get number of statement parse workers (0 parses inline)."""
+        return self.get("email.parse_workers", 0)
+
+    @property
+    def email_parse_executor(self) -> str:
+        """Get statement parse executor kind: "thread" or "process"."""
+        return self.get("email.parse_executor", "thread")
+
     @property
     def zen_money_api_key(self) -> str:
         """Get ZenMoney API key."""
@@ -80,6 +107,21 @@ class Config:
         """Get ZenMoney user ID."""
         return self.get("zen_money.user_id", 0)
 
+    @property
+    def zen_money_request_timeout(self) -> float:
+        """Get ZenMoney API request timeout in seconds."""
+        return self.get("zen_money.request_timeout", 60)
+
+    @property
+    def zen_money_upload_chunk_size(self) -> int:
+        """Get number of transactions sent per upload request."""
+        return self.get("zen_money.upload_chunk_size", 500)
+
+    @property
+    def zen_money_upload_max_retries(self) -> int:
+        """Get number of retries for throttled or failed upload requests."""
+        return self.get("zen_money.upload_max_retries", 5)
+
     @property
     def currency_config(self) -> Dict[str, Any]:
         """Get currency configuration."""
@@ -90,6 +132,11 @@ class Config:
         """Get category configuration."""
         return self.get("category_config", {})
 
+    @property
+    def learn_payee_categories(self) -> bool:
+        """Get whether payee categories are learned from ZenMoney transactions."""
+        return self.get("category_learning.enabled", False)
+
     @property
     def deel_config(self) -> Dict[str, Any]:
         """Get Deel configuration."""
@@ -100,11 +147,110 @@ class Config:
         """Get cash withdrawal configuration."""
         return self.get("cash_withdrawal_config", {})
 
+    @property
+    def storage_directory(self) -> Path:
+        """Get local storage directory, relative to the config file."""
+        return self._path.parent / self.get("storage.directory", "data")
+
+    @property
+    def statement_cache_max_bytes(self) -> int:
+        """Get parsed statement cache size limit in bytes (0 disables the cache)."""
+        return int(self.get("storage.statement_cache_mb", 64) * 1024 * 1024)
+
+    @property
+    def import_index_enabled(self) -> bool:
+        """Get whether ids of imported transactions are kept in a local index."""
+        return self.get("storage.import_index", False)
+
+    @property
+    def backfill_window_days(self) -> int:
+        """Get number of days imported per backfill window."""
+        return self.get("backfill.window_days", 30)
+
+    @property
+    def daemon_idle_timeout(self) -> int:
+        """Get seconds an IMAP IDLE waits before it is renewed."""
+        return self.get("daemon.idle_timeout", 600)
+
+    @property
+    def daemon_reconnect_delay(self) -> int:
+        """Get seconds to wait before reconnecting after a lost IMAP session."""
+        return self.get("daemon.reconnect_delay", 30)
+
+    @property
+    def metrics_jsonl_file(self) -> Path | None:
+        """Get JSON lines file for per-stage run metrics, relative to the config file."""
+        path = self.get("metrics.jsonl_file")
+        return self._path.parent / path if path else None
+
+    @property
+    def metrics_prometheus_file(self) -> Path | None:
+        """Get Prometheus text file for run metrics, relative to the config file."""
+        path = self.get("metrics.prometheus_file")
+        return self._path.parent / path if path else None
+
+    @cached_property
+    def profiles(self) -> list[Profile]:
+        """Get mailbox -> ZenMoney profiles, the top-level sections by default."""
+        entries = self.get("profiles", [])
+        if not entries:
+            return [self._profile({"name": "default"}, self.storage_directory)]
+
+        profiles = []
+        for entry in entries:
+            name = entry["name"]
+            if any(profile.name == name for profile in profiles):
+                raise ValueError(f"Duplicate profile name: {name}")
+            profiles.append(self._profile(entry, self.storage_directory / name))
+        return profiles
+
+    @property
+    def default_profile(self) -> Profile:
+        """Get the profile used when none is selected: the first one."""
+        return self.profiles[0]
+
+    @property
+    def profile_workers(self) -> int:
+        """Get number of profiles imported at once."""
+        return self.get("profile_workers", 4)
+
+    def _profile(self, entry: Dict[str, Any], storage_directory: Path) -> Profile:
+        """Build a profile, taking values it does not set from the top level."""
+
+        def get(key: str, default: Any) -> Any:
+            value = _lookup(entry, key)
+            return self.get(key, default) if value is None else value
+
+        return Profile(
+            name=entry["name"],
+            email_username=get("email.username", ""),
+            email_password=get("email.password", ""),
+            zen_money_api_key=get("zen_money.api_key", ""),
+            zen_money_user_id=get("zen_money.user_id", 0),
+            storage_directory=storage_directory,
+            currency_config=get("currency_config", {}),
+            category_config=get("category_config", {}),
+            deel_config=get("deel_config", {}),
+            cash_withdrawal_config=get("cash_withdrawal_config", {}),
+        )
+
     def __getitem__(self, key: str) -> Any:
         """Allow dictionary-style access."""
         return self.get(key)
 
 
+def _lookup(data: Dict[str, Any], key: str) -> Any:
+    """Get a nested value by dot-separated key, None if missing"""
+    value = data
+    for k in key.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(k)
+        if value is None:
+            return None
+    return value
+
+
 # Global config instance
 _config_instance: Config | None = None
 
@@ -0,0 +1,263 @@
+"""Import statements as soon as they arrive, over one IMAP IDLE session.
+
+Usage: python cli.py daemon [--profile NAME]
+
+Unlike main.py, which runs once per cron tick, the process stays up: the
+IMAP login, the ZenMoney keep-alive connections and the import index are
+set up once, and IMAP IDLE wakes the import as soon as mail is
+delivered. The ZenMoney state and its index stay in memory between
+wake-ups, and only the changes since the last one are requested. A lost
+IMAP session is reopened after a pause; a failed import is logged and
+retried on the next wake-up.
+
+One daemon serves one profile; run a daemon per mailbox.
+"""
+
+import dataclasses
+import sys
+import time
+import traceback
+
+import requests
+from imapclient import IMAPClient
+from imapclient.exceptions import IMAPClientError
+
+import metrics
+from config import Profile
+from envs import (
+    DAEMON_IDLE_TIMEOUT,
+    DAEMON_RECONNECT_DELAY,
+    DEFAULT_PROFILE,
+    METRICS_JSONL_FILE,
+    METRICS_PROMETHEUS_FILE,
+)
+from pipeline import (
+    create_statement_cache,
+    fetch_and_prepare,
+    import_operations,
+    load_state,
+    open_import_index,
+)
+from services.emails_statements.cache import StatementCache
+from services.emails_statements.getter import connect, iter_statements
+from services.emails_statements.watermark import UIDWatermarkStore
+from services.zen_money.import_index import ImportIndex
+from services.zen_money.state_index import ZenMoneyStateIndex
+from services.zen_money.state_store import ZenMoneyStateStore
+from services.zen_money.uploader import BatchUploader, create_uploader
+from services.zen_money.zen_money_api import (
+    Account,
+    Instrument,
+    TransactionSummary,
+    ZenMoneyAPIError,
+    ZenMoneyStateSummary,
+    get_diff,
+)
+
+# Window scanned when there is no watermark yet, as in main.py
+DAYS = 7
+
+# Diff entity name -> model, as in ZenMoneyStateSummary
+_ENTITIES = {
+    "instrument": Instrument,
+    "account": Account,
+    "transaction": TransactionSummary,
+}
+
+
+class WarmState:
+    """ZenMoney state and its index, kept in memory between wake-ups.
+
+    The first refresh loads the state as a single run would; later ones
+    request only the changes since the last serverTimestamp, save them to
+    the local copy and apply them in memory. The index is rebuilt only
+    when instruments or accounts change.
+
+    Every refresh goes over the same keep-alive session, whichever thread
+    runs it.
+    """
+
+    def __init__(self, profile: Profile = DEFAULT_PROFILE):
+        self.profile = profile
+        self.state: ZenMoneyStateSummary | None = None
+        self.index: ZenMoneyStateIndex | None = None
+        # Entity name -> id -> entity
+        self._entities: dict[str, dict] = {}
+        self._session = requests.Session()
+
+    def close(self) -> None:
+        self._session.close()
+
+    def refresh(self) -> ZenMoneyStateSummary:
+        if self.state is None:
+            self.state = load_state(DAYS, self.profile, self._session)
+            self._entities = {
+                name: {entity.id: entity for entity in getattr(self.state, name)}
+                for name in _ENTITIES
+            }
+            self.index = ZenMoneyStateIndex.from_state(self.state)
+            return self.state
+
+        with metrics.stage("get_state"):
+            items = get_diff(
+                self.state.serverTimestamp,
+                self.profile.zen_money_api_key,
+                self._session,
+            )
+            with ZenMoneyStateStore(self.profile.storage_directory) as store:
+                store.merge(items)
+            self._apply(items)
+        return self.state
+
+    def _apply(self, items: list[tuple]) -> None:
+        changed = set()
+        server_timestamp = self.state.serverTimestamp
+        for name, value in items:
+            if name in _ENTITIES:
+                if value is not None:
+                    entity = _ENTITIES[name].model_validate(value)
+                    self._entities[name][entity.id] = entity
+                    changed.add(name)
+            elif name == "deletion":
+                if value is not None and value.get("object") in _ENTITIES:
+                    self._entities[value["object"]].pop(value["id"], None)
+                    changed.add(value["object"])
+            elif name == "serverTimestamp":
+                server_timestamp = value
+
+        self.state = ZenMoneyStateSummary.model_construct(
+            serverTimestamp=server_timestamp,
+            **{
+                name: list(entities.values())
+                for name, entities in self._entities.items()
+            },
+        )
+        if changed - {"transaction"}:
+            self.index = ZenMoneyStateIndex.from_state(self.state)
+        elif changed:
+            self.index = dataclasses.replace(
+                self.index,
+                transaction_ids=frozenset(
+                    transaction.id
+                    for transaction in self.state.transaction
+                    if not transaction.deleted
+                ),
+            )
+
+
+def run_daemon(profile: Profile = DEFAULT_PROFILE) -> None:
+    cache = create_statement_cache(profile)
+    import_index = open_import_index(profile)
+    uploader = create_uploader(profile.storage_directory, profile.zen_money_api_key)
+    warm_state = WarmState(profile)
+
+    try:
+        while True:
+            try:
+                server = connect(profile.email_username, profile.email_password)
+            except (IMAPClientError, OSError) as e:
+                print(f"Не удалось подключиться к почте: {e}")
+            else:
+                try:
+                    _serve(server, cache, import_index, uploader, warm_state, profile)
+                except (IMAPClientError, OSError) as e:
+                    print(f"Соединение с почтой потеряно: {e}")
+                finally:
+                    _logout(server)
+
+            time.sleep(DAEMON_RECONNECT_DELAY)
+    finally:
+        warm_state.close()
+        uploader.close()
+        if import_index is not None:
+            import_index.close()
+
+
+def import_new_mail(
+    server: IMAPClient,
+    cache: StatementCache | None,
+    import_index: ImportIndex | None,
+    uploader: BatchUploader,
+    warm_state: WarmState,
+    profile: Profile = DEFAULT_PROFILE,
+) -> None:
+    """Import mail that arrived since the last processed UID.
+
+    Import failures are reported and left for the next wake-up: the
+    watermark is only saved after a successful import. Only a lost IMAP
+    session is raised, for run_daemon to reconnect.
+    """
+    metrics.reset()
+    status = "error"
+    # Отметка читается заново, чтобы неудачный импорт ее не сдвинул
+    watermarks = UIDWatermarkStore(profile.storage_directory)
+
+    try:
+        with metrics.stage("run"):
+            operations, zen_money_state = fetch_and_prepare(
+                DAYS,
+                import_index=import_index,
+                statements=iter_statements(server, DAYS, watermarks, cache),
+                lazy_state=True,
+                state_loader=warm_state.refresh,
+                profile=profile,
+            )
+            if zen_money_state is not None:
+                import_operations(
+                    operations,
+                    zen_money_state,
+                    import_index,
+                    uploader,
+                    profile,
+                    state_index=warm_state.index,
+                )
+
+            watermarks.save()
+        status = "ok"
+    except (requests.RequestException, ZenMoneyAPIError) as e:
+        print(f"Импорт не удался, повторим при следующей проверке: {e}")
+    except (IMAPClientError, OSError):
+        # Почтовая сессия потеряна - run_daemon подключится заново
+        raise
+    except Exception:
+        # Ошибка одного импорта не должна останавливать демона
+        traceback.print_exc()
+        print("Импорт не удался, повторим при следующей проверке")
+    finally:
+        metrics.emit(METRICS_JSONL_FILE, METRICS_PROMETHEUS_FILE, status)
+
+
+def _serve(
+    server: IMAPClient,
+    cache: StatementCache | None,
+    import_index: ImportIndex | None,
+    uploader: BatchUploader,
+    warm_state: WarmState,
+    profile: Profile,
+) -> None:
+    """Import new mail, then wait in IDLE until the server reports more.
+
+    IDLE is renewed every DAEMON_IDLE_TIMEOUT seconds, and every renewal
+    also checks for mail, in case a notification was missed.
+    """
+    while True:
+        import_new_mail(server, cache, import_index, uploader, warm_state, profile)
+
+        server.idle()
+        try:
+            server.idle_check(timeout=DAEMON_IDLE_TIMEOUT)
+        finally:
+            server.idle_done()
+
+
+def _logout(server: IMAPClient) -> None:
+    try:
+        server.logout()
+    except (IMAPClientError, OSError):
+        pass
+
+
+if __name__ == "__main__":
+    from cli import main
+
+    sys.exit(main(["daemon", *sys.argv[1:]]))
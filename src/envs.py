@@ -2,30 +2,68 @@
 
 This module maintains backward compatibility by loading configuration
 from the YAML config file using the config reader.
+
+The config file is read on first access to a setting, not on import,
+so commands that never touch a setting do not pay for loading it.
 """
 
-from config import get_config
+from typing import Any
 
-# Load configuration from YAML
-_config = get_config()
+from config import get_config
 
-# Email configuration
-EMAIL_USERNAME = _config.email_username
-EMAIL_PASSWORD = _config.email_password
-EMAIL_ALLOWED_SUBJECTS = _config.email_allowed_subjects
+# Setting name -> Config property
+_SETTINGS = {
+    # Email configuration
+    "EMAIL_USERNAME": "email_username",
+    "EMAIL_PASSWORD": "email_password",
+    "EMAIL_ALLOWED_SUBJECTS": "email_allowed_subjects",
+    "EMAIL_FETCH_MODE": "email_fetch_mode",
+    "PARSE_WORKERS": "email_parse_workers",
+    "PARSE_EXECUTOR": "email_parse_executor",
+    # Zen Money configuration
+    "ZEN_MONEY_API_KEY": "zen_money_api_key",
+    "USER_ID": "zen_money_user_id",
+    "ZEN_MONEY_REQUEST_TIMEOUT": "zen_money_request_timeout",
+    "ZEN_MONEY_UPLOAD_CHUNK_SIZE": "zen_money_upload_chunk_size",
+    "ZEN_MONEY_UPLOAD_MAX_RETRIES": "zen_money_upload_max_retries",
+    # Currency configuration
+    "CURRENCY_CONFIG": "currency_config",
+    # Category configuration
+    "CATEGORY_CONFIG": "category_config",
+    # Learned payee -> category map
+    "LEARN_PAYEE_CATEGORIES": "learn_payee_categories",
+    # Deel configuration
+    "DEEL_CONFIG": "deel_config",
+    # Cash withdrawal configuration
+    "CASH_WITHDRAWAL_CONFIG": "cash_withdrawal_config",
+    # Local storage configuration
+    "STORAGE_DIRECTORY": "storage_directory",
+    "STATEMENT_CACHE_MAX_BYTES": "statement_cache_max_bytes",
+    "USE_IMPORT_INDEX": "import_index_enabled",
+    # Backfill configuration
+    "BACKFILL_WINDOW_DAYS": "backfill_window_days",
+    # Mailbox -> ZenMoney profiles (the settings above form the only one by default)
+    "PROFILES": "profiles",
+    "DEFAULT_PROFILE": "default_profile",
+    "PROFILE_WORKERS": "profile_workers",
+    # Daemon (IMAP IDLE) configuration
+    "DAEMON_IDLE_TIMEOUT": "daemon_idle_timeout",
+    "DAEMON_RECONNECT_DELAY": "daemon_reconnect_delay",
+    # Run metrics output
+    "METRICS_JSONL_FILE": "metrics_jsonl_file",
+    "METRICS_PROMETHEUS_FILE": "metrics_prometheus_file",
+}
 
-# Zen Money configuration
-ZEN_MONEY_API_KEY = _config.zen_money_api_key
-USER_ID = _config.zen_money_user_id
 
-# Currency configuration
-CURRENCY_CONFIG = _config.currency_config
+def __getattr__(name: str) -> Any:
+    if name not in _SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Category configuration
-CATEGORY_CONFIG = _config.category_config
+    value = getattr(get_config(), _SETTINGS[name])
+    # Later lookups find the value without calling __getattr__
+    globals()[name] = value
+    return value
 
-# Deel configuration
-DEEL_CONFIG = _config.deel_config
 
-# Cash withdrawal configuration
-CASH_WITHDRAWAL_CONFIG = _config.cash_withdrawal_config
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_SETTINGS])
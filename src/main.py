@@ -1,68 +1,83 @@
-from envs import CASH_WITHDRAWAL_CONFIG, DEEL_CONFIG
-from services.emails_statements.getter import get_statements
-from services.operations.filter import filter_operations
-from services.operations.operations import (
-    CashWithdrawalOperation,
-    DeelTransferOperation,
-    SimpleOperation,
-    TransitionOperation,
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from config import Profile
+from envs import (
+    METRICS_JSONL_FILE,
+    METRICS_PROMETHEUS_FILE,
+    PROFILE_WORKERS,
+    PROFILES,
 )
-from services.operations.preparer import prepare_operations
-from services.zen_money.preparer import prepare_new_state
-from services.zen_money.zen_money_api import get_state, update_state
+from pipeline import fetch_and_prepare, import_operations, open_import_index
+from services.emails_statements.watermark import UIDWatermarkStore
 
+DAYS = 7
 
-def main():
-    DAYS = 7
 
-    statements = get_statements(DAYS)
-    print(f"Получено выписок: {len(statements)}")
+def main(dry_run: bool = False):
+    """Import new statements of every profile.
 
-    # Подсчитываем общее количество операций из выписок
-    total_raw_operations = sum(len(stmt.operations) for stmt in statements)
-    print(f"Всего операций в выписках: {total_raw_operations}")
+    A dry run lists what would be imported: nothing is pushed, and the
+    watermarks, the import index and the run metrics stay as they were.
+    """
+    status = "error"
+    try:
+        with metrics.stage("run"):
+            if len(PROFILES) == 1:
+                import_profile(PROFILES[0], dry_run)
+            else:
+                import_profiles(PROFILES, dry_run)
+        status = "ok"
+    finally:
+        if not dry_run:
+            metrics.emit(METRICS_JSONL_FILE, METRICS_PROMETHEUS_FILE, status)
 
-    zen_money_state = get_state(DAYS)
 
-    operations = prepare_operations(
-        statements,
-        deel_config=DEEL_CONFIG,
-        cash_withdrawal_config=CASH_WITHDRAWAL_CONFIG,
-    )
-    print(f"После дедупликации и обработки: {len(operations)} операций")
+def import_profile(profile: Profile, dry_run: bool = False) -> None:
+    """Import new statements of the profile's mailbox into its ZenMoney user"""
+    watermarks = UIDWatermarkStore(profile.storage_directory)
+    import_index = open_import_index(profile)
 
-    filtered_operations = filter_operations(operations, zen_money_state)
-    print(
-        f"После фильтрации существующих в ZenMoney: {len(filtered_operations)} операций"
+    operations, zen_money_state = fetch_and_prepare(
+        DAYS, watermarks, import_index, profile=profile
     )
+    if zen_money_state is not None:
+        import_operations(
+            operations, zen_money_state, import_index, profile=profile, dry_run=dry_run
+        )
+
+    # Письма обработаны - следующий запуск начнет с новых
+    if not dry_run:
+        watermarks.save()
+
+
+def import_profiles(profiles: list[Profile], dry_run: bool = False) -> None:
+    """Import profiles concurrently, at most PROFILE_WORKERS at once.
+
+    Profiles share nothing but the process: a failed profile is reported
+    after the others have finished.
+    """
+    with ThreadPoolExecutor(max_workers=PROFILE_WORKERS) as executor:
+        futures = {
+            profile.name: executor.submit(_import_named_profile, profile, dry_run)
+            for profile in profiles
+        }
+
+    failed = []
+    for name, future in futures.items():
+        error = future.exception()
+        if error is not None:
+            print(f"Профиль {name}: ошибка импорта: {error!r}")
+            failed.append(name)
+
+    if failed:
+        raise RuntimeError(f"Импорт не удался для профилей: {', '.join(failed)}")
+
 
-    if filtered_operations:
-        print(f"Найдено {len(filtered_operations)} новых операций для импорта")
-
-        print("\nНовые операции:")
-        for i, operation in enumerate(filtered_operations, 1):
-            if isinstance(operation, SimpleOperation):
-                print(
-                    f"{i}. {operation.date} - {operation.amount} {operation.currency} - {operation.customer}"
-                )
-            elif isinstance(operation, TransitionOperation):
-                print(
-                    f"{i}. {operation.date} - {operation.from_amount} {operation.from_currency} → {operation.to_amount} {operation.to_currency}"
-                )
-            elif isinstance(operation, DeelTransferOperation):
-                print(
-                    f"{i}. [DEEL] {operation.date} - {operation.amount} {operation.currency} - {operation.customer}"
-                )
-            elif isinstance(operation, CashWithdrawalOperation):
-                print(
-                    f"{i}. [CASH] {operation.date} - {operation.amount} {operation.currency} - {operation.customer}"
-                )
-
-        new_zen_money_state = prepare_new_state(filtered_operations)
-        update_state(new_zen_money_state)
-        print("\nОперации успешно импортированы!")
-    else:
-        print("Новых операций для импорта не найдено")
+def _import_named_profile(profile: Profile, dry_run: bool) -> None:
+    print(f"Профиль {profile.name}: начинаем импорт")
+    import_profile(profile, dry_run)
+    print(f"Профиль {profile.name}: импорт завершен")
 
 
 if __name__ == "__main__":
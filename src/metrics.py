@@ -0,0 +1,158 @@
+"""Per-stage timings and counters of a run.
+
+Stages are timed with `stage()` and can carry counters (operations in and
+out, bytes transferred...). Everything accumulates in one process-wide
+registry and is written out once per run by `emit()`: a JSON line per
+stage and, optionally, a Prometheus text file.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator
+
+PROMETHEUS_PREFIX = "raiffeisen_to_zenmoney"
+
+
+@dataclass
+class StageMetrics:
+    seconds: float = 0.0
+    calls: int = 0
+    counters: dict[str, int] = field(default_factory=dict)
+
+
+class Stage:
+    """Handle of a running stage, for counting inside the `with` block"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def count(self, counter: str, value: int = 1) -> None:
+        count(self.name, counter, value)
+
+
+_lock = threading.Lock()
+_stages: dict[str, StageMetrics] = {}
+
+
+@contextmanager
+def stage(name: str) -> Iterator[Stage]:
+    """Time a stage; repeated and concurrent runs of a stage add up"""
+    started = time.perf_counter()
+    try:
+        yield Stage(name)
+    finally:
+        add(name, time.perf_counter() - started)
+
+
+def add(
+    stage_name: str, seconds: float, counters: dict[str, int] | None = None
+) -> None:
+    """Record a stage run timed elsewhere, e.g. in a worker process"""
+    with _lock:
+        metrics = _stages.setdefault(stage_name, StageMetrics())
+        metrics.seconds += seconds
+        metrics.calls += 1
+        for counter, value in (counters or {}).items():
+            metrics.counters[counter] = metrics.counters.get(counter, 0) + value
+
+
+def count(stage_name: str, counter: str, value: int = 1) -> None:
+    with _lock:
+        counters = _stages.setdefault(stage_name, StageMetrics()).counters
+        counters[counter] = counters.get(counter, 0) + value
+
+
+def snapshot() -> dict[str, StageMetrics]:
+    with _lock:
+        return {
+            name: StageMetrics(m.seconds, m.calls, dict(m.counters))
+            for name, m in _stages.items()
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _stages.clear()
+
+
+def summary() -> dict[str, dict]:
+    """Stages as plain dicts: seconds, calls and the counters"""
+    return {
+        name: {"seconds": round(m.seconds, 6), "calls": m.calls, **m.counters}
+        for name, m in snapshot().items()
+    }
+
+
+def emit(
+    jsonl_path: Path | None = None,
+    prometheus_path: Path | None = None,
+    status: str = "ok",
+) -> None:
+    """Append the run's stages to a JSON lines file and/or write Prometheus text"""
+    stages = snapshot()
+    finished = datetime.now(timezone.utc)
+
+    if jsonl_path:
+        jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(jsonl_path, "a", encoding="utf-8") as f:
+            for name, values in summary().items():
+                record = {
+                    "time": finished.isoformat(timespec="seconds"),
+                    "status": status,
+                    "stage": name,
+                    **values,
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    if prometheus_path:
+        prometheus_path.parent.mkdir(parents=True, exist_ok=True)
+        # Written atomically, so a textfile collector never sees half a file
+        tmp_path = prometheus_path.with_name(f"{prometheus_path.name}.tmp")
+        tmp_path.write_text(
+            _prometheus_text(stages, finished, status), encoding="utf-8"
+        )
+        tmp_path.replace(prometheus_path)
+
+
+def _prometheus_text(
+    stages: dict[str, StageMetrics], finished: datetime, status: str
+) -> str:
+    p = PROMETHEUS_PREFIX
+    lines = [
+        f"# HELP {p}_stage_seconds Time spent in a stage during the last run.",
+        f"# TYPE {p}_stage_seconds gauge",
+    ]
+    lines += [
+        f'{p}_stage_seconds{{stage="{name}"}} {m.seconds:.6f}'
+        for name, m in stages.items()
+    ]
+
+    lines += [
+        f"# HELP {p}_stage_calls Times a stage ran during the last run.",
+        f"# TYPE {p}_stage_calls gauge",
+    ]
+    lines += [
+        f'{p}_stage_calls{{stage="{name}"}} {m.calls}' for name, m in stages.items()
+    ]
+
+    lines += [
+        f"# HELP {p}_stage_count Stage counters (operations, bytes...) of the last run.",
+        f"# TYPE {p}_stage_count gauge",
+    ]
+    lines += [
+        f'{p}_stage_count{{stage="{name}",counter="{counter}"}} {value}'
+        for name, m in stages.items()
+        for counter, value in m.counters.items()
+    ]
+
+    lines += [
+        f"# HELP {p}_last_run_timestamp_seconds When the last run finished.",
+        f"# TYPE {p}_last_run_timestamp_seconds gauge",
+        f'{p}_last_run_timestamp_seconds{{status="{status}"}} {finished.timestamp():.0f}',
+    ]
+    return "\n".join(lines) + "\n"
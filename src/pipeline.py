@@ -0,0 +1,386 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, Iterator
+
+import requests
+
+import metrics
+from config import Profile
+from envs import (
+    DEFAULT_PROFILE,
+    LEARN_PAYEE_CATEGORIES,
+    STATEMENT_CACHE_MAX_BYTES,
+    USE_IMPORT_INDEX,
+)
+from services.emails_statements.cache import StatementCache
+from services.emails_statements.getter import stream_statements
+from services.emails_statements.statement import Statement, StatementStream
+from services.emails_statements.watermark import UIDWatermarkStore
+from services.operations.filter import filter_operations, has_raiffeisen_account
+from services.operations.operations import (
+    CashWithdrawalOperation,
+    DeelTransferOperation,
+    SimpleOperation,
+    TransitionOperation,
+)
+from services.operations.preparer import prepare_operations
+from services.zen_money.import_index import ImportIndex
+from services.zen_money.payee_categories import PayeeCategoryStore
+from services.zen_money.preparer import prepare_new_state
+from services.zen_money.state_index import ZenMoneyStateIndex
+from services.zen_money.uploader import BatchUploader, create_uploader
+from services.zen_money.state_store import ZenMoneyStateStore
+from services.zen_money.zen_money_api import (
+    NewZenMoneyState,
+    ZenMoneyStateSummary,
+    get_state,
+)
+
+
+def create_statement_cache(
+    profile: Profile = DEFAULT_PROFILE,
+) -> StatementCache | None:
+    if not STATEMENT_CACHE_MAX_BYTES:
+        return None
+    return StatementCache(
+        profile.storage_directory / "statements", STATEMENT_CACHE_MAX_BYTES
+    )
+
+
+def fetch_and_prepare(
+    days: int,
+    watermarks: UIDWatermarkStore | None = None,
+    import_index: ImportIndex | None = None,
+    statements: Iterable[Statement] | None = None,
+    lazy_state: bool = False,
+    state_loader: Callable[[], ZenMoneyStateSummary] | None = None,
+    profile: Profile = DEFAULT_PROFILE,
+) -> tuple[
+    list[
+        SimpleOperation
+        | TransitionOperation
+        | DeelTransferOperation
+        | CashWithdrawalOperation
+    ],
+    ZenMoneyStateSummary | None,
+]:
+    """Download statements and ZenMoney state concurrently.
+
+    The state is loaded on a background thread while statements are
+    streamed from IMAP straight into prepare_operations, so the run takes
+    about as long as the slower of the two.
+
+    With an import index or lazy_state, the state is only requested once
+    the statements are prepared and there are operations left that the
+    index does not know; otherwise it is not requested at all and None
+    is returned.
+
+    statements replaces a fresh IMAP connection, e.g. to read from an
+    already authenticated session with iter_statements, and state_loader
+    replaces load_state, e.g. to reuse a state kept in memory.
+    """
+    if state_loader is None:
+        state_loader = partial(load_state, days, profile)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        state_future = None
+
+        def start_loading_state() -> None:
+            nonlocal state_future
+            if state_future is None:
+                state_future = executor.submit(state_loader)
+
+        if import_index is None and not lazy_state:
+            start_loading_state()
+
+        if statements is None:
+            statements = stream_statements(
+                days,
+                watermarks,
+                create_statement_cache(profile),
+                profile.email_username,
+                profile.email_password,
+            )
+
+        counter = _StatementCounter()
+        operations = prepare(counter.count(statements), profile)
+        print(f"Получено выписок: {counter.statements}")
+        print(f"Всего операций в выписках: {counter.operations}")
+
+        operations = skip_imported(operations, import_index)
+        if not operations and state_future is None:
+            print("Новых операций нет, ZenMoney не запрашиваем")
+            return operations, None
+
+        start_loading_state()
+        zen_money_state = state_future.result()
+
+    print(f"Транзакций в локальной копии ZenMoney: {len(zen_money_state.transaction)}")
+    return operations, zen_money_state
+
+
+def load_state(
+    days: int,
+    profile: Profile = DEFAULT_PROFILE,
+    session: requests.Session | None = None,
+) -> ZenMoneyStateSummary:
+    with (
+        metrics.stage("get_state"),
+        ZenMoneyStateStore(profile.storage_directory) as store,
+    ):
+        return get_state(
+            days, store, api_key=profile.zen_money_api_key, session=session
+        )
+
+
+def import_statements(
+    statements: Iterable[Statement | StatementStream],
+    zen_money_state: ZenMoneyStateSummary,
+    import_index: ImportIndex | None = None,
+    profile: Profile = DEFAULT_PROFILE,
+) -> int:
+    """Prepare, filter and push statement operations, return imported count"""
+    operations = skip_imported(prepare(statements, profile), import_index)
+    return import_operations(operations, zen_money_state, import_index, profile=profile)
+
+
+def open_import_index(profile: Profile = DEFAULT_PROFILE) -> ImportIndex | None:
+    if not USE_IMPORT_INDEX:
+        return None
+    return ImportIndex(profile.storage_directory)
+
+
+def skip_imported(
+    operations: list[
+        SimpleOperation
+        | TransitionOperation
+        | DeelTransferOperation
+        | CashWithdrawalOperation
+    ],
+    import_index: ImportIndex | None,
+) -> list[
+    SimpleOperation
+    | TransitionOperation
+    | DeelTransferOperation
+    | CashWithdrawalOperation
+]:
+    """Drop operations the import index knows, without looking at the state"""
+    if import_index is None:
+        return operations
+
+    with metrics.stage("import_index") as stage:
+        new_operations = [
+            operation
+            for operation in operations
+            if operation.import_id not in import_index
+        ]
+        stage.count("in", len(operations))
+        stage.count("out", len(new_operations))
+    if len(new_operations) < len(operations):
+        print(
+            f"Уже импортированы ранее (по индексу): "
+            f"{len(operations) - len(new_operations)} операций"
+        )
+    return new_operations
+
+
+def prepare(
+    statements: Iterable[Statement | StatementStream],
+    profile: Profile = DEFAULT_PROFILE,
+) -> list[
+    SimpleOperation
+    | TransitionOperation
+    | DeelTransferOperation
+    | CashWithdrawalOperation
+]:
+    operations = prepare_operations(
+        statements,
+        deel_config=profile.deel_config,
+        cash_withdrawal_config=profile.cash_withdrawal_config,
+        category_config=profile.category_config,
+    )
+    print(f"После дедупликации и обработки: {len(operations)} операций")
+    return operations
+
+
+def import_operations(
+    operations: list[
+        SimpleOperation
+        | TransitionOperation
+        | DeelTransferOperation
+        | CashWithdrawalOperation
+    ],
+    zen_money_state: ZenMoneyStateSummary,
+    import_index: ImportIndex | None = None,
+    uploader: BatchUploader | None = None,
+    profile: Profile = DEFAULT_PROFILE,
+    dry_run: bool = False,
+    state_index: ZenMoneyStateIndex | None = None,
+) -> int:
+    """Filter operations against ZenMoney state and push new ones.
+
+    Once they are all in ZenMoney, the ids of the operations are recorded
+    in the import index, whether they were pushed now or found there.
+    Operations dropped for lack of a Raiffeisen account in their currency
+    are not recorded, so they are imported once the account exists.
+    A given uploader is left open for the next import, a given state
+    index is used instead of indexing the state. A dry run only lists the
+    new operations.
+    """
+    filtered_operations, imported_ids = find_new_operations(
+        operations, zen_money_state, import_index, state_index
+    )
+
+    if not filtered_operations:
+        if not dry_run:
+            record_imported(imported_ids, import_index)
+        return 0
+
+    if dry_run:
+        print("\nПробный запуск: операции не отправлены")
+        return len(filtered_operations)
+
+    new_zen_money_state = build_new_state(filtered_operations, zen_money_state, profile)
+    push_new_state(new_zen_money_state, uploader, profile)
+    print("\nОперации успешно импортированы!")
+    record_imported(imported_ids, import_index)
+
+    return len(filtered_operations)
+
+
+def find_new_operations(
+    operations: list[
+        SimpleOperation
+        | TransitionOperation
+        | DeelTransferOperation
+        | CashWithdrawalOperation
+    ],
+    zen_money_state: ZenMoneyStateSummary,
+    import_index: ImportIndex | None = None,
+    state_index: ZenMoneyStateIndex | None = None,
+) -> tuple[
+    list[
+        SimpleOperation
+        | TransitionOperation
+        | DeelTransferOperation
+        | CashWithdrawalOperation
+    ],
+    list[str],
+]:
+    """Drop operations already in ZenMoney and list the remaining ones.
+
+    Also returns the import ids to record once the remaining operations
+    are pushed: theirs and those of the operations found in ZenMoney.
+    """
+    with metrics.stage("filter") as stage:
+        if state_index is None:
+            state_index = ZenMoneyStateIndex.from_state(zen_money_state)
+        filtered_operations = filter_operations(
+            operations, zen_money_state, state_index, import_index
+        )
+        stage.count("in", len(operations))
+        stage.count("out", len(filtered_operations))
+        imported_ids = [
+            operation.import_id
+            for operation in operations
+            if has_raiffeisen_account(operation, state_index)
+        ]
+    print(
+        f"После фильтрации существующих в ZenMoney: {len(filtered_operations)} операций"
+    )
+
+    if not filtered_operations:
+        print("Новых операций для импорта не найдено")
+        return filtered_operations, imported_ids
+
+    print(f"Найдено {len(filtered_operations)} новых операций для импорта")
+
+    print("\nНовые операции:")
+    for i, operation in enumerate(filtered_operations, 1):
+        if isinstance(operation, SimpleOperation):
+            print(
+                f"{i}. {operation.date} - {operation.amount} {operation.currency} - {operation.customer}"
+            )
+        elif isinstance(operation, TransitionOperation):
+            print(
+                f"{i}. {operation.date} - {operation.from_amount} {operation.from_currency} → {operation.to_amount} {operation.to_currency}"
+            )
+        elif isinstance(operation, DeelTransferOperation):
+            print(
+                f"{i}. [DEEL] {operation.date} - {operation.amount} {operation.currency} - {operation.customer}"
+            )
+        elif isinstance(operation, CashWithdrawalOperation):
+            print(
+                f"{i}. [CASH] {operation.date} - {operation.amount} {operation.currency} - {operation.customer}"
+            )
+
+    return filtered_operations, imported_ids
+
+
+def build_new_state(
+    operations: list[
+        SimpleOperation
+        | TransitionOperation
+        | DeelTransferOperation
+        | CashWithdrawalOperation
+    ],
+    zen_money_state: ZenMoneyStateSummary,
+    profile: Profile = DEFAULT_PROFILE,
+) -> NewZenMoneyState:
+    with metrics.stage("prepare_transactions"):
+        payee_categories = load_payee_categories(zen_money_state, profile)
+        return prepare_new_state(operations, payee_categories, profile)
+
+
+def push_new_state(
+    new_zen_money_state: NewZenMoneyState,
+    uploader: BatchUploader | None = None,
+    profile: Profile = DEFAULT_PROFILE,
+) -> None:
+    """Upload transactions, over a given uploader or a new one for the profile"""
+    if uploader is not None:
+        with metrics.stage("upload"):
+            uploader.upload(new_zen_money_state)
+        return
+
+    uploader = create_uploader(profile.storage_directory, profile.zen_money_api_key)
+    try:
+        with metrics.stage("upload"):
+            uploader.upload(new_zen_money_state)
+    finally:
+        uploader.close()
+
+
+def record_imported(
+    import_ids: Iterable[str], import_index: ImportIndex | None
+) -> None:
+    if import_index is not None:
+        import_index.add(import_ids)
+        import_index.save()
+
+
+def load_payee_categories(
+    zen_money_state: ZenMoneyStateSummary,
+    profile: Profile = DEFAULT_PROFILE,
+) -> PayeeCategoryStore | None:
+    """Load learned payee categories and add ones tagged in ZenMoney since"""
+    if not LEARN_PAYEE_CATEGORIES:
+        return None
+
+    payee_categories = PayeeCategoryStore(profile.storage_directory)
+    learned = payee_categories.learn_from_transactions(zen_money_state.transaction)
+    payee_categories.save()
+    print(f"Известных категорий получателей: {len(payee_categories)} (+{learned})")
+    return payee_categories
+
+
+class _StatementCounter:
+    def __init__(self):
+        self.statements = 0
+        self.operations = 0
+
+    def count(self, statements: Iterable[Statement]) -> Iterator[Statement]:
+        for statement in statements:
+            self.statements += 1
+            self.operations += len(statement.operations)
+            yield statement
@@ -0,0 +1,161 @@
+"""Split an import into a plan that can be reviewed and a later apply.
+
+Usage: python cli.py plan PATH [--profile NAME]
+       python cli.py apply PATH
+
+plan runs the whole pipeline - mail, ZenMoney state, dedup, filtering,
+transaction preparation - but writes the transactions it would push to
+PATH together with the per-stage counts: one JSON document, or NDJSON
+(a header line, then a transaction per line) for .ndjson/.jsonl paths.
+
+apply pushes a saved plan without fetching mail or state, then records
+the import ids and moves the mail watermarks like a normal run would.
+Transaction ids are deterministic, so applying a plan again overwrites
+the same transactions instead of duplicating them.
+"""
+
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+import metrics
+from config import Profile
+from envs import DEFAULT_PROFILE, PROFILES
+from main import DAYS
+from pipeline import (
+    build_new_state,
+    fetch_and_prepare,
+    find_new_operations,
+    open_import_index,
+    push_new_state,
+    record_imported,
+)
+from services.emails_statements.watermark import UIDWatermark, UIDWatermarkStore
+from services.zen_money.uploader import state_payload
+from services.zen_money.zen_money_api import NewZenMoneyState, Transaction
+
+PLAN_VERSION = 1
+NDJSON_SUFFIXES = {".ndjson", ".jsonl"}
+
+
+@dataclass
+class Plan:
+    profile: str
+    created: str
+    # Watermarks and import ids a successful apply records
+    watermarks: dict[str, dict]
+    import_ids: list[str]
+    stages: dict[str, dict]
+    transactions: list[dict]
+
+
+def create_plan(path: Path, profile: Profile = DEFAULT_PROFILE) -> Plan:
+    """Compute the import of new mail and save it to path, pushing nothing"""
+    metrics.reset()
+    watermarks = UIDWatermarkStore(profile.storage_directory)
+    import_index = open_import_index(profile)
+
+    operations, zen_money_state = fetch_and_prepare(
+        DAYS, watermarks, import_index, profile=profile
+    )
+
+    transactions = []
+    import_ids = []
+    if zen_money_state is not None:
+        new_operations, import_ids = find_new_operations(
+            operations, zen_money_state, import_index
+        )
+        if new_operations:
+            new_zen_money_state = build_new_state(
+                new_operations, zen_money_state, profile
+            )
+            transactions = state_payload(new_zen_money_state)["transaction"]
+
+    plan = Plan(
+        profile=profile.name,
+        created=datetime.now().isoformat(timespec="seconds"),
+        watermarks=watermarks.to_dict(),
+        import_ids=import_ids,
+        stages=metrics.summary(),
+        transactions=transactions,
+    )
+    write_plan(path, plan)
+    print(f"\nПлан сохранен в {path}: {len(transactions)} транзакций")
+    return plan
+
+
+def apply_plan(path: Path) -> int:
+    """Push a saved plan, return the number of transactions sent"""
+    plan = read_plan(path)
+    profile = next((p for p in PROFILES if p.name == plan.profile), None)
+    if profile is None:
+        raise ValueError(f"Профиль плана не найден в конфигурации: {plan.profile}")
+
+    print(f"План от {plan.created}: {len(plan.transactions)} транзакций")
+    if plan.transactions:
+        push_new_state(
+            NewZenMoneyState(
+                currentClientTimestamp=int(datetime.now().timestamp()),
+                serverTimestamp=0,
+                transaction=[
+                    Transaction.model_validate(transaction)
+                    for transaction in plan.transactions
+                ],
+            ),
+            profile=profile,
+        )
+        print("\nОперации успешно импортированы!")
+
+    import_index = open_import_index(profile)
+    record_imported(plan.import_ids, import_index)
+
+    watermarks = UIDWatermarkStore(profile.storage_directory)
+    for folder, planned in plan.watermarks.items():
+        planned = UIDWatermark(**planned)
+        current = watermarks.get(folder)
+        # Запуск после построения плана мог уже продвинуть отметку
+        if (
+            current is None
+            or current.uidvalidity != planned.uidvalidity
+            or current.uid < planned.uid
+        ):
+            watermarks.update(folder, planned)
+    watermarks.save()
+
+    return len(plan.transactions)
+
+
+def write_plan(path: Path, plan: Plan) -> None:
+    header = {"version": PLAN_VERSION, **asdict(plan)}
+    transactions = header.pop("transactions")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        if path.suffix in NDJSON_SUFFIXES:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+            for transaction in transactions:
+                f.write(json.dumps(transaction, ensure_ascii=False) + "\n")
+        else:
+            json.dump(
+                {**header, "transactions": transactions},
+                f,
+                ensure_ascii=False,
+                indent=2,
+            )
+    tmp_path.replace(path)
+
+
+def read_plan(path: Path) -> Plan:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix in NDJSON_SUFFIXES:
+            data = json.loads(f.readline())
+            data["transactions"] = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
+
+    version = data.pop("version", None)
+    if version != PLAN_VERSION:
+        raise ValueError(f"Неподдерживаемая версия плана: {version}")
+    return Plan(**data)
@@ -0,0 +1,89 @@
+import hashlib
+import marshal
+import os
+import zlib
+from pathlib import Path
+
+from .statement import RawOperation, Statement
+
+# Bump when the serialized layout changes, old entries are then ignored
+FORMAT_VERSION = 2
+
+
+def attachment_digest(attachment: bytes) -> str:
+    return hashlib.sha256(attachment).hexdigest()
+
+
+class StatementCache:
+    """Parsed statements on disk, keyed by SHA-256 of the XML attachment.
+
+    Entries are marshal-ed tuples compressed with zlib. Reading an entry
+    refreshes its mtime, and the least recently used entries are evicted
+    once the directory grows over max_bytes.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, digest: str) -> Statement | None:
+        path = self._path(digest)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        try:
+            version, account_number, operations = marshal.loads(zlib.decompress(data))
+        except (ValueError, EOFError, TypeError, zlib.error):
+            return None
+        if version != FORMAT_VERSION:
+            return None
+
+        os.utime(path)
+        return Statement(
+            account_number=account_number,
+            operations=[RawOperation(*operation) for operation in operations],
+        )
+
+    def put(self, digest: str, statement: Statement) -> None:
+        data = (
+            FORMAT_VERSION,
+            statement.account_number,
+            [
+                (
+                    operation.customer,
+                    operation.amount_minor,
+                    operation.currency,
+                    operation.reference,
+                    operation.date_ordinal,
+                    operation.description,
+                )
+                for operation in statement.operations
+            ],
+        )
+
+        path = self._path(digest)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_bytes(zlib.compress(marshal.dumps(data)))
+        tmp_path.replace(path)
+
+        self._evict()
+
+    def _path(self, digest: str) -> Path:
+        return self._directory / f"{digest}.bin"
+
+    def _evict(self) -> None:
+        entries = []
+        for entry in os.scandir(self._directory):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _mtime, size, _path in entries)
+        for _mtime, size, path in sorted(entries):
+            if total <= self._max_bytes:
+                break
+            os.remove(path)
+            total -= size
@@ -1,41 +1,273 @@
 import base64
+import quopri
 from datetime import date, timedelta
+from email.header import decode_header, make_header
+from typing import Iterator
 
-import mailparser
 from imapclient import IMAPClient
 
-from envs import EMAIL_ALLOWED_SUBJECTS, EMAIL_PASSWORD, EMAIL_USERNAME
+import metrics
+from envs import (
+    EMAIL_ALLOWED_SUBJECTS,
+    EMAIL_FETCH_MODE,
+    EMAIL_PASSWORD,
+    EMAIL_USERNAME,
+    PARSE_EXECUTOR,
+    PARSE_WORKERS,
+)
 
+from .cache import StatementCache
+from .parsing import StatementParser, create_executor
 from .statement import Statement
+from .watermark import UIDWatermark, UIDWatermarkStore
 
+SENDER = "RaiffeisenOnline@raiffeisenbank.rs"
+FETCH_BATCH_SIZE = 50
 
-def get_statements(days: int = 1) -> list[Statement]:
+
+def get_statements(
+    days: int = 1,
+    watermarks: UIDWatermarkStore | None = None,
+    cache: StatementCache | None = None,
+    since: date | None = None,
+    before: date | None = None,
+    username: str = EMAIL_USERNAME,
+    password: str = EMAIL_PASSWORD,
+) -> list[Statement]:
+    server = connect(username, password)
+
+    try:
+        return fetch_statements(
+            server, days, watermarks, cache, since=since, before=before
+        )
+    finally:
+        server.logout()
+
+
+def stream_statements(
+    days: int = 1,
+    watermarks: UIDWatermarkStore | None = None,
+    cache: StatementCache | None = None,
+    username: str = EMAIL_USERNAME,
+    password: str = EMAIL_PASSWORD,
+) -> Iterator[Statement]:
+    """Like get_statements, but yields statements as soon as they are parsed"""
+    server = connect(username, password)
+
+    try:
+        yield from iter_statements(server, days, watermarks, cache)
+    finally:
+        server.logout()
+
+
+def connect(
+    username: str = EMAIL_USERNAME, password: str = EMAIL_PASSWORD
+) -> IMAPClient:
     server = IMAPClient("imap.gmail.com", use_uid=True, ssl=True)
-    server.login(EMAIL_USERNAME, EMAIL_PASSWORD)
-    server.select_folder("INBOX")
+    server.login(username, password)
+    return server
 
-    since_date = (date.today() - timedelta(days=days)).strftime("%d-%b-%Y")
 
-    messages = server.search(
-        f'(FROM "RaiffeisenOnline@raiffeisenbank.rs" SINCE {since_date})'
+def fetch_statements(
+    server: IMAPClient,
+    days: int = 1,
+    watermarks: UIDWatermarkStore | None = None,
+    cache: StatementCache | None = None,
+    folder: str = "INBOX",
+    since: date | None = None,
+    before: date | None = None,
+) -> list[Statement]:
+    return list(
+        iter_statements(
+            server, days, watermarks, cache, folder, since=since, before=before
+        )
     )
 
-    statements = []
 
-    for _uid, message_data in server.fetch(messages, "RFC822").items():
-        mail = mailparser.parse_from_bytes(message_data[b"RFC822"])
+def iter_statements(
+    server: IMAPClient,
+    days: int = 1,
+    watermarks: UIDWatermarkStore | None = None,
+    cache: StatementCache | None = None,
+    folder: str = "INBOX",
+    since: date | None = None,
+    before: date | None = None,
+) -> Iterator[Statement]:
+    """Fetch statements from an authenticated IMAP session.
+
+    Statements are yielded in mail order while later mail is still being
+    fetched; the watermark is updated once the iterator is exhausted.
+
+    With watermarks, only messages with UIDs above the last processed one
+    are fetched; the `days` window is scanned on the first run or when
+    the folder UIDVALIDITY changes. since/before (exclusive) override the
+    window with an explicit date range.
+    """
+    folder_info = server.select_folder(folder)
+    uidvalidity = folder_info[b"UIDVALIDITY"]
+
+    watermark = watermarks.get(folder) if watermarks else None
+    if watermark and watermark.uidvalidity != uidvalidity:
+        watermark = None
+
+    with metrics.stage("imap_search") as search:
+        if watermark:
+            # "N:*" always matches the newest message, even when its UID < N
+            messages = [
+                uid
+                for uid in server.search(f'(FROM "{SENDER}" UID {watermark.uid + 1}:*)')
+                if uid > watermark.uid
+            ]
+        else:
+            since = since or date.today() - timedelta(days=days)
+            criteria = f'FROM "{SENDER}" SINCE {since.strftime("%d-%b-%Y")}'
+            if before:
+                criteria += f' BEFORE {before.strftime("%d-%b-%Y")}'
+            messages = server.search(f"({criteria})")
+        search.count("messages", len(messages))
+
+    with create_executor(PARSE_WORKERS, PARSE_EXECUTOR) as executor:
+        parser = StatementParser(executor, EMAIL_ALLOWED_SUBJECTS, cache)
+
+        # Письма забираем пачками, чтобы разбор шел параллельно с загрузкой
+        for start in range(0, len(messages), FETCH_BATCH_SIZE):
+            batch = messages[start : start + FETCH_BATCH_SIZE]
+
+            if EMAIL_FETCH_MODE == "parts":
+                parser.add_attachments(_fetch_xml_parts(server, batch))
+            else:
+                with metrics.stage("imap_fetch") as fetch:
+                    fetched = sorted(server.fetch(batch, "RFC822").items())
+                    fetch.count("messages", len(fetched))
+                    fetch.count(
+                        "bytes",
+                        sum(
+                            len(message_data[b"RFC822"]) for _, message_data in fetched
+                        ),
+                    )
+                for _uid, message_data in fetched:
+                    parser.add_message(message_data[b"RFC822"])
+
+            yield from parser.ready()
+
+        yield from parser.results()
+
+    if watermarks is not None:
+        last_uid = _last_uid(messages, watermark, folder_info)
+        if last_uid is not None:
+            watermarks.update(
+                folder, UIDWatermark(uidvalidity=uidvalidity, uid=last_uid)
+            )
+
+
+def _last_uid(
+    messages: list[int], watermark: UIDWatermark | None, folder_info: dict
+) -> int | None:
+    """UID to continue after, None when there is nothing to start from.
 
-        if mail.subject not in EMAIL_ALLOWED_SUBJECTS:
+    An empty window scan starts after the newest message in the folder:
+    a watermark of 0 would make the next run fetch the whole mailbox.
+    """
+    if messages:
+        return max(messages)
+    if watermark:
+        return watermark.uid
+    uidnext = folder_info.get(b"UIDNEXT")
+    return uidnext - 1 if uidnext else None
+
+
+def _fetch_xml_parts(server: IMAPClient, messages: list[int]) -> list[bytes]:
+    """Download only XML attachment parts of messages with allowed subjects.
+
+    ENVELOPE and BODYSTRUCTURE are fetched first, so HTML bodies, PDF copies
+    and mail with other subjects never leave the server.
+    """
+    if not messages:
+        return []
+
+    with metrics.stage("imap_fetch") as fetch:
+        structures = server.fetch(messages, ["ENVELOPE", "BODYSTRUCTURE"])
+        fetch.count("messages", len(structures))
+
+    # uid -> [(part number, transfer encoding)]
+    xml_parts = {}
+    for uid, message_data in structures.items():
+        if (
+            _decode_subject(message_data[b"ENVELOPE"].subject)
+            not in EMAIL_ALLOWED_SUBJECTS
+        ):
             continue
 
-        for attachment in mail.attachments:
-            if not attachment.get("filename", "").lower().endswith(".xml"):
-                continue
+        parts = list(_find_xml_parts(message_data[b"BODYSTRUCTURE"]))
+        if parts:
+            xml_parts[uid] = parts
+
+    # Письма с одинаковой структурой забираем одним запросом
+    uids_by_parts = {}
+    for uid, parts in xml_parts.items():
+        uids_by_parts.setdefault(tuple(part for part, _ in parts), []).append(uid)
+
+    bodies = {}
+    with metrics.stage("imap_fetch") as fetch:
+        for part_numbers, uids in uids_by_parts.items():
+            bodies.update(
+                server.fetch(uids, [f"BODY.PEEK[{part}]" for part in part_numbers])
+            )
+
+    attachments = []
+    for uid in sorted(xml_parts):
+        for part, encoding in xml_parts[uid]:
+            payload = bodies[uid].get(f"BODY[{part}]".encode())
+            if payload:
+                fetch.count("bytes", len(payload))
+                attachments.append(_decode_part(payload, encoding))
+
+    return attachments
+
+
+def _decode_subject(subject: bytes | None) -> str:
+    if not subject:
+        return ""
+    return str(make_header(decode_header(subject.decode(errors="replace"))))
+
+
+def _find_xml_parts(body, prefix: str = ""):
+    """Yield (part number, encoding) for .xml attachments in a BODYSTRUCTURE"""
+    if body.is_multipart:
+        for number, part in enumerate(body[0], 1):
+            yield from _find_xml_parts(part, f"{prefix}{number}.")
+        return
+
+    if _part_filename(body).lower().endswith(".xml"):
+        yield prefix.rstrip(".") or "1", (body[5] or b"").upper()
+
+
+def _part_filename(body) -> str:
+    """Get filename from Content-Disposition or Content-Type parameters"""
+    param_lists = [body[2]]
+    # Disposition is ("attachment", (params)) somewhere in the extension data
+    for item in body[7:]:
+        if (
+            isinstance(item, tuple)
+            and len(item) == 2
+            and isinstance(item[0], bytes)
+            and isinstance(item[1], tuple)
+        ):
+            param_lists.append(item[1])
+
+    for params in param_lists:
+        if not params:
+            continue
+        for key, value in zip(params[::2], params[1::2]):
+            if key.upper() in (b"FILENAME", b"NAME") and value:
+                return str(make_header(decode_header(value.decode(errors="replace"))))
 
-            payload = attachment.get("payload")
-            if not payload:
-                continue
+    return ""
 
-            statements.append(Statement.from_xml(base64.b64decode(payload).decode()))
 
-    return statements
+def _decode_part(payload: bytes, encoding: bytes) -> bytes:
+    if encoding == b"BASE64":
+        return base64.b64decode(payload)
+    if encoding == b"QUOTED-PRINTABLE":
+        return quopri.decodestring(payload)
+    return payload
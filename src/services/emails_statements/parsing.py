@@ -0,0 +1,164 @@
+import base64
+import time
+from collections import deque
+from typing import Any, Callable, Iterator
+from concurrent.futures import (
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+
+import mailparser
+
+import metrics
+from .cache import StatementCache, attachment_digest
+from .statement import Statement
+
+
+class InlineExecutor(Executor):
+    """Executor running submitted work right away in the calling thread"""
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+
+def create_executor(workers: int, kind: str = "thread") -> Executor:
+    """Create a parse executor; 0 workers parses inline on the calling thread"""
+    if workers <= 0:
+        return InlineExecutor()
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    # lxml releases the GIL while parsing, so threads scale as well
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="statements")
+
+
+def extract_xml_attachments(message: bytes, allowed_subjects: list[str]) -> list[bytes]:
+    """Get decoded XML attachments of an RFC822 message with an allowed subject"""
+    mail = mailparser.parse_from_bytes(message)
+
+    if mail.subject not in allowed_subjects:
+        return []
+
+    attachments = []
+    for attachment in mail.attachments:
+        if not attachment.get("filename", "").lower().endswith(".xml"):
+            continue
+
+        payload = attachment.get("payload")
+        if not payload:
+            continue
+
+        attachments.append(base64.b64decode(payload))
+
+    return attachments
+
+
+def parse_statement(attachment: bytes) -> Statement:
+    return Statement.from_xml(attachment)
+
+
+def _timed(fn: Callable, *args) -> tuple[Any, float]:
+    """Run fn in a worker, return its result and wall time (s)"""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class StatementParser:
+    """Ordered MIME/XML parse pipeline on top of an executor.
+
+    Messages and attachments are submitted as they are fetched, results are
+    returned in submission order, so downstream deduplication stays
+    deterministic regardless of which worker finishes first. Repeated
+    attachments are skipped and cached statements are not parsed again.
+
+    Workers only time their work: the mime_parse and xml_parse metrics
+    are recorded here, so process workers do not lose them.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        allowed_subjects: list[str],
+        cache: StatementCache | None = None,
+    ):
+        self._executor = executor
+        self._allowed_subjects = allowed_subjects
+        self._cache = cache
+        # Futures with (attachments, seconds), not yet handed to XML parsing;
+        # seconds is None for attachments fetched without MIME parsing
+        self._attachments: deque[Future] = deque()
+        # (digest, future with (Statement, seconds), attachment size) in
+        # submission order; the size is None for cached statements
+        self._statements: deque[tuple[str, Future, int | None]] = deque()
+        self._seen_digests: set[str] = set()
+
+    def add_message(self, message: bytes) -> None:
+        self._attachments.append(
+            self._executor.submit(
+                _timed, extract_xml_attachments, message, self._allowed_subjects
+            )
+        )
+        self._drain(wait=False)
+
+    def add_attachments(self, attachments: list[bytes]) -> None:
+        future = Future()
+        future.set_result((attachments, None))
+        self._attachments.append(future)
+        self._drain(wait=False)
+
+    def ready(self) -> Iterator[Statement]:
+        """Yield statements that are already parsed, without waiting"""
+        self._drain(wait=False)
+        while self._statements and self._statements[0][1].done():
+            yield self._take()
+
+    def results(self) -> Iterator[Statement]:
+        """Yield all remaining statements, waiting for parsing to finish"""
+        self._drain(wait=True)
+        while self._statements:
+            yield self._take()
+
+    def _take(self) -> Statement:
+        digest, future, size = self._statements.popleft()
+        statement, seconds = future.result()
+        if size is not None:
+            metrics.add(
+                "xml_parse",
+                seconds,
+                {"bytes": size, "operations": len(statement.operations)},
+            )
+            if self._cache:
+                self._cache.put(digest, statement)
+        return statement
+
+    def _drain(self, wait: bool) -> None:
+        """Move finished attachment extractions (in order) to XML parsing"""
+        while self._attachments and (wait or self._attachments[0].done()):
+            attachments, seconds = self._attachments.popleft().result()
+            if seconds is not None:
+                metrics.add("mime_parse", seconds, {"attachments": len(attachments)})
+
+            for attachment in attachments:
+                digest = attachment_digest(attachment)
+                if digest in self._seen_digests:
+                    continue
+                self._seen_digests.add(digest)
+
+                statement = self._cache.get(digest) if self._cache else None
+                metrics.count(
+                    "statement_cache", "hits" if statement is not None else "misses"
+                )
+                if statement is not None:
+                    future = Future()
+                    future.set_result((statement, None))
+                    self._statements.append((digest, future, None))
+                else:
+                    future = self._executor.submit(_timed, parse_statement, attachment)
+                    self._statements.append((digest, future, len(attachment)))
@@ -1,18 +1,33 @@
+import io
 from dataclasses import dataclass
-from typing import Self
+from datetime import date, datetime
+from typing import Iterator, Self
 
 from lxml import etree  # pyright: ignore
 
+# Amounts are stored in integer hundredths of the currency unit
+MINOR_UNITS = 100
+# DatumValute format
+STATEMENT_DATE_FORMAT = "%d.%m.%Y"
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class RawOperation:
     customer: str
-    amount: float
+    amount_minor: int
     currency: str
     reference: str
-    data: str
+    date_ordinal: int
     description: str
 
+    @property
+    def amount(self) -> float:
+        return self.amount_minor / MINOR_UNITS
+
+    @property
+    def date(self) -> str:
+        return iso_date(self.date_ordinal)
+
 
 @dataclass
 class Statement:
@@ -20,33 +35,138 @@ class Statement:
     operations: list[RawOperation]
 
     @classmethod
-    def from_xml(cls, xml_content: str) -> Self:
-        tree = etree.fromstring(xml_content)
-
-        account_info = tree.find("Zaglavlje")
-        account_number = account_info.attrib.get("Partija")
-        currency = account_info.attrib.get("OznakaValute", "RSD")
-
-        operations = []
-
-        operations_info = tree.findall("Stavke")
-        for operation in operations_info:
-            if operation.attrib.get("Duguje", "0") != "0":
-                amount = -float(operation.attrib.get("Duguje"))
-            elif operation.attrib.get("Potrazuje", "0") != "0":
-                amount = float(operation.attrib.get("Potrazuje"))
-            else:
+    def from_xml(cls, xml_content: str | bytes) -> Self:
+        stream = StatementStream(xml_content)
+        return cls(account_number=stream.account_number, operations=list(stream))
+
+
+class StatementStream:
+    """Statement parsed incrementally with iterparse.
+
+    The header is read on creation; operations are yielded while iterating,
+    and processed elements are cleared, so memory does not grow with the
+    statement size.
+    """
+
+    def __init__(self, xml_content: str | bytes):
+        if isinstance(xml_content, str):
+            xml_content = xml_content.encode()
+
+        self._events = etree.iterparse(
+            io.BytesIO(xml_content), events=("end",), tag=("Zaglavlje", "Stavke")
+        )
+        # Operations found before the header (currency is not known yet)
+        self._pending: list[dict[str, str]] = []
+
+        for _event, element in self._events:
+            if not _is_top_level(element):
                 continue
 
-            operations.append(
-                RawOperation(
-                    customer=operation.attrib.get("NalogKorisnik", ""),
-                    amount=amount,
-                    currency=currency,
-                    data=operation.attrib.get("DatumValute", ""),
-                    reference=operation.attrib.get("Referenca", ""),
-                    description=operation.attrib.get("Opis", ""),
-                )
-            )
-
-        return cls(account_number=account_number, operations=operations)
+            if element.tag == "Zaglavlje":
+                self.account_number = element.attrib.get("Partija")
+                self.currency = element.attrib.get("OznakaValute", "RSD")
+                _release(element)
+                break
+
+            self._pending.append(dict(element.attrib))
+            _release(element)
+        else:
+            raise ValueError("Statement header (Zaglavlje) not found")
+
+    @property
+    def operations(self) -> Iterator[RawOperation]:
+        """Operations iterator, so a stream can stand in for a Statement"""
+        return iter(self)
+
+    def __iter__(self) -> Iterator[RawOperation]:
+        for attrib in self._pending:
+            operation = _parse_operation(attrib, self.currency)
+            if operation:
+                yield operation
+        self._pending = []
+
+        for _event, element in self._events:
+            if element.tag == "Stavke" and _is_top_level(element):
+                operation = _parse_operation(element.attrib, self.currency)
+                if operation:
+                    yield operation
+            _release(element)
+
+
+def to_minor_units(amount: str | float) -> int:
+    return round(float(amount) * MINOR_UNITS)
+
+
+def parse_date(value: str) -> int:
+    """Convert a dd.mm.yyyy statement date to an ordinal, 0 if missing or malformed"""
+    ordinal = _date_ordinals.get(value)
+    if ordinal is None:
+        ordinal = _date_ordinals[value] = _slice_date(value) if value else 0
+    return ordinal
+
+
+def iso_date(ordinal: int) -> str:
+    """Format a date ordinal as yyyy-mm-dd, the way ZenMoney stores dates"""
+    value = _iso_dates.get(ordinal)
+    if value is None:
+        value = _iso_dates[ordinal] = (
+            date.fromordinal(ordinal).isoformat() if ordinal else ""
+        )
+    return value
+
+
+def format_date(ordinal: int) -> str:
+    """Format a date ordinal as a dd.mm.yyyy statement date"""
+    if not ordinal:
+        return ""
+    return date.fromordinal(ordinal).strftime(STATEMENT_DATE_FORMAT)
+
+
+# A statement window only has a few distinct dates, so both directions
+# are memoized and every operation of a day shares the same objects
+_date_ordinals: dict[str, int] = {}
+_iso_dates: dict[int, str] = {}
+
+
+def _slice_date(value: str) -> int:
+    if len(value) == 10 and value[2] == "." and value[5] == ".":
+        try:
+            return date(int(value[6:]), int(value[3:5]), int(value[:2])).toordinal()
+        except ValueError:
+            pass
+    # Unexpected layout - let strptime handle it; a malformed date does not
+    # abort the whole statement
+    try:
+        return datetime.strptime(value, STATEMENT_DATE_FORMAT).toordinal()
+    except ValueError:
+        return 0
+
+
+def _parse_operation(attrib, currency: str) -> RawOperation | None:
+    if attrib.get("Duguje", "0") != "0":
+        amount = -to_minor_units(attrib.get("Duguje"))
+    elif attrib.get("Potrazuje", "0") != "0":
+        amount = to_minor_units(attrib.get("Potrazuje"))
+    else:
+        return None
+
+    return RawOperation(
+        customer=attrib.get("NalogKorisnik", ""),
+        amount_minor=amount,
+        currency=currency,
+        date_ordinal=parse_date(attrib.get("DatumValute", "")),
+        reference=attrib.get("Referenca", ""),
+        description=attrib.get("Opis", ""),
+    )
+
+
+def _is_top_level(element) -> bool:
+    parent = element.getparent()
+    return parent is not None and parent.getparent() is None
+
+
+def _release(element) -> None:
+    """Free a processed element and its already processed siblings"""
+    element.clear(keep_tail=True)
+    while element.getprevious() is not None:
+        del element.getparent()[0]
@@ -0,0 +1,46 @@
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+@dataclass
+class UIDWatermark:
+    uidvalidity: int
+    uid: int
+
+
+class UIDWatermarkStore:
+    """Last processed IMAP UID per folder, persisted as JSON.
+
+    Updates stay pending until save(), so a failed import does not move
+    the watermark past unprocessed mail.
+    """
+
+    FILENAME = "imap_watermarks.json"
+
+    def __init__(self, directory: Path):
+        self._path = directory / self.FILENAME
+        self._watermarks: dict[str, UIDWatermark] = {}
+
+        if self._path.exists():
+            with open(self._path, "r", encoding="utf-8") as f:
+                self._watermarks = {
+                    folder: UIDWatermark(**watermark)
+                    for folder, watermark in json.load(f).items()
+                }
+
+    def get(self, folder: str) -> UIDWatermark | None:
+        return self._watermarks.get(folder)
+
+    def update(self, folder: str, watermark: UIDWatermark) -> None:
+        self._watermarks[folder] = watermark
+
+    def to_dict(self) -> dict[str, dict]:
+        return {folder: asdict(w) for folder, w in self._watermarks.items()}
+
+    def save(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        tmp_path.replace(self._path)
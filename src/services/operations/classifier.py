@@ -0,0 +1,157 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable
+
+from services.emails_statements.statement import RawOperation
+
+EXCHANGE_KEYWORDS = [
+    "otkup",
+    "kupoprodaja deviza",
+    "dinarska protivvrednost",
+    "po kursu",
+    "protivvrednost",
+]
+EXCHANGE_CUSTOMER = "raiffeisen banka"
+# Cash withdrawals have masked card numbers in the description
+CARD_NUMBER_MASK = "******"
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: all patterns are found in one pass"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[int, ...]] = [()]
+
+        for index, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[node][char] = child
+                node = child
+            self._output[node] += (index,)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] += self._output[self._fail[child]]
+
+    def find(self, text: str) -> set[int]:
+        """Return indexes of all patterns that occur in text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set(output[0])
+        node = 0
+
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+
+        return found
+
+
+@dataclass(frozen=True, slots=True)
+class Classification:
+    deel: bool
+    cash: bool
+    exchange: bool
+    # Category of the first configured payee found in the customer
+    category: str | None
+
+
+class OperationClassifier:
+    """Deel, cash withdrawal, currency exchange and category matching.
+
+    All keywords from the configs are compiled into one case-insensitive
+    Aho–Corasick automaton, so customer and description are scanned once
+    per operation regardless of how many keywords and payees are configured.
+    """
+
+    _DEEL = "deel"
+    _CASH = "cash"
+    _EXCHANGE = "exchange"
+    _EXCHANGE_CUSTOMER = "exchange_customer"
+    _CARD_NUMBER = "card_number"
+    _CATEGORY = "category"
+
+    def __init__(
+        self,
+        deel_config: dict | None = None,
+        cash_withdrawal_config: dict | None = None,
+        category_config: dict[str, str] | None = None,
+    ):
+        # Lowercase keyword -> pattern index
+        patterns: dict[str, int] = {}
+        # Pattern index -> [(kind, category config order)]
+        self._meanings: list[list[tuple[str, int | None]]] = []
+
+        def add(keyword: str, kind: str, value: int | None = None) -> None:
+            keyword = keyword.lower()
+            if keyword not in patterns:
+                patterns[keyword] = len(patterns)
+                self._meanings.append([])
+            self._meanings[patterns[keyword]].append((kind, value))
+
+        if deel_config and deel_config.get("enabled", False):
+            for keyword in deel_config.get("keywords", []):
+                add(keyword, self._DEEL)
+
+        if cash_withdrawal_config and cash_withdrawal_config.get("enabled", False):
+            for keyword in cash_withdrawal_config.get("keywords", []):
+                add(keyword, self._CASH)
+
+        for keyword in EXCHANGE_KEYWORDS:
+            add(keyword, self._EXCHANGE)
+        add(EXCHANGE_CUSTOMER, self._EXCHANGE_CUSTOMER)
+        add(CARD_NUMBER_MASK, self._CARD_NUMBER)
+
+        self._categories = list((category_config or {}).items())
+        for order, (payee, _category_id) in enumerate(self._categories):
+            add(payee, self._CATEGORY, order)
+
+        self._matcher = AhoCorasick(patterns)
+
+    def classify(self, operation: RawOperation) -> Classification:
+        customer_hits = self._kinds(operation.customer)
+        description_hits = self._kinds(operation.description)
+
+        return Classification(
+            deel=operation.amount_minor > 0
+            and (self._DEEL in customer_hits or self._DEEL in description_hits),
+            cash=operation.amount_minor < 0
+            and (self._CASH in customer_hits or self._CASH in description_hits),
+            exchange=self._CARD_NUMBER not in description_hits
+            and (
+                self._EXCHANGE in description_hits
+                or self._EXCHANGE_CUSTOMER in customer_hits
+            ),
+            category=self._first_category(customer_hits),
+        )
+
+    def _kinds(self, text: str) -> dict[str, list[int | None]]:
+        hits: dict[str, list[int | None]] = {}
+        for index in self._matcher.find(text.lower()):
+            for kind, value in self._meanings[index]:
+                hits.setdefault(kind, []).append(value)
+        return hits
+
+    def _first_category(self, hits: dict[str, list]) -> str | None:
+        orders = hits.get(self._CATEGORY)
+        if not orders:
+            return None
+        return self._categories[min(orders)][1]
@@ -1,22 +1,12 @@
-from datetime import datetime
-
 from services.operations.operations import (
     CashWithdrawalOperation,
     DeelTransferOperation,
     SimpleOperation,
     TransitionOperation,
 )
-from services.zen_money.zen_money_api import ZenMoneyState
-
-
-def _convert_date_to_iso(date_str: str) -> str:
-    try:
-        if "." in date_str:
-            dt = datetime.strptime(date_str, "%d.%m.%Y")
-            return dt.strftime("%Y-%m-%d")
-        return date_str
-    except ValueError:
-        return date_str
+from services.zen_money.import_index import ImportIndex
+from services.zen_money.state_index import ZenMoneyStateIndex
+from services.zen_money.zen_money_api import ZenMoneyStateSummary
 
 
 def filter_operations(
@@ -26,22 +16,24 @@ def filter_operations(
         | DeelTransferOperation
         | CashWithdrawalOperation
     ],
-    zen_money_state: ZenMoneyState,
+    zen_money_state: ZenMoneyStateSummary,
+    state_index: ZenMoneyStateIndex | None = None,
+    import_index: ImportIndex | None = None,
 ) -> list[
     SimpleOperation
     | TransitionOperation
     | DeelTransferOperation
     | CashWithdrawalOperation
 ]:
-    raiffeizen_accounts = {}
-    for account in zen_money_state.account:
-        if account.title.startswith("Raiffeizen B"):
-            instrument = next(
-                (i for i in zen_money_state.instrument if i.id == account.instrument),
-                None,
-            )
-            if instrument:
-                raiffeizen_accounts[instrument.shortTitle] = account.id
+    if state_index is None:
+        state_index = ZenMoneyStateIndex.from_state(zen_money_state)
+
+    raiffeizen_accounts = state_index.raiffeisen_accounts
+    raiffeizen_account_ids = state_index.raiffeisen_account_ids
+    transaction_ids = state_index.transaction_ids
+
+    # Ids given to these operations; ids of earlier imports are in the index
+    own_import_ids = {operation.import_id for operation in operations}
 
     existing_transactions = set()
     existing_import_operations = set()
@@ -50,18 +42,19 @@ def filter_operations(
         if transaction.deleted:
             continue
 
+        # Imports with deterministic ids are recognized by id alone,
+        # keys are only needed for legacy and manually added transactions
+        if transaction.id in own_import_ids or (
+            import_index is not None and transaction.id in import_index
+        ):
+            continue
+
         if (
-            transaction.incomeAccount in raiffeizen_accounts.values()
-            or transaction.outcomeAccount in raiffeizen_accounts.values()
+            transaction.incomeAccount in raiffeizen_account_ids
+            or transaction.outcomeAccount in raiffeizen_account_ids
         ):
-            instrument = next(
-                (
-                    i
-                    for i in zen_money_state.instrument
-                    if i.id == transaction.incomeInstrument
-                    or i.id == transaction.outcomeInstrument
-                ),
-                None,
+            instrument = state_index.first_instrument(
+                transaction.incomeInstrument, transaction.outcomeInstrument
             )
 
             if instrument:
@@ -82,13 +75,8 @@ def filter_operations(
                 ):
                     if transaction.comment.startswith("Обмен валют: "):
                         if transaction.outcome > 0:
-                            outcome_instrument = next(
-                                (
-                                    i
-                                    for i in zen_money_state.instrument
-                                    if i.id == transaction.outcomeInstrument
-                                ),
-                                None,
+                            outcome_instrument = state_index.instruments.get(
+                                transaction.outcomeInstrument
                             )
                             if outcome_instrument:
                                 outcome_key = (
@@ -100,13 +88,8 @@ def filter_operations(
                                 existing_import_operations.add(outcome_key)
 
                         if transaction.income > 0:
-                            income_instrument = next(
-                                (
-                                    i
-                                    for i in zen_money_state.instrument
-                                    if i.id == transaction.incomeInstrument
-                                ),
-                                None,
+                            income_instrument = state_index.instruments.get(
+                                transaction.incomeInstrument
                             )
                             if income_instrument:
                                 income_key = (
@@ -133,12 +116,15 @@ def filter_operations(
     filtered_operations = []
 
     for operation in operations:
+        if operation.import_id in transaction_ids:
+            continue
+
         if isinstance(operation, SimpleOperation):
-            if operation.currency not in raiffeizen_accounts:
+            if not has_raiffeisen_account(operation, state_index):
                 continue
 
             amount = abs(operation.amount)
-            iso_date = _convert_date_to_iso(operation.date)
+            iso_date = operation.date
             key = (iso_date, amount, operation.currency)
 
             expected_comment = f"Импорт: {operation.customer} ({operation.currency})"
@@ -154,7 +140,7 @@ def filter_operations(
         elif isinstance(operation, TransitionOperation):
             expected_comment = f"Обмен валют: {operation.from_amount} {operation.from_currency} → {operation.to_amount} {operation.to_currency}"
 
-            iso_date = _convert_date_to_iso(operation.date)
+            iso_date = operation.date
             from_import_key = (
                 iso_date,
                 abs(operation.from_amount),
@@ -201,7 +187,7 @@ def filter_operations(
         elif isinstance(operation, DeelTransferOperation):
             # Deel transfers are always incoming
             amount = abs(operation.amount)
-            iso_date = _convert_date_to_iso(operation.date)
+            iso_date = operation.date
             expected_comment = f"Transfer from Deel: {operation.customer}"
 
             import_key = (iso_date, amount, operation.currency, expected_comment)
@@ -213,7 +199,7 @@ def filter_operations(
         elif isinstance(operation, CashWithdrawalOperation):
             # Cash withdrawals are always outgoing (negative amount)
             amount = abs(operation.amount)
-            iso_date = _convert_date_to_iso(operation.date)
+            iso_date = operation.date
             expected_comment = f"Снятие наличных: {operation.customer}"
 
             import_key = (iso_date, amount, operation.currency, expected_comment)
@@ -223,3 +209,23 @@ def filter_operations(
                 filtered_operations.append(operation)
 
     return filtered_operations
+
+
+def has_raiffeisen_account(
+    operation: (
+        SimpleOperation
+        | TransitionOperation
+        | DeelTransferOperation
+        | CashWithdrawalOperation
+    ),
+    state_index: ZenMoneyStateIndex,
+) -> bool:
+    """Whether filter_operations can import the operation or find it in the state.
+
+    Simple operations in a currency without a Raiffeisen account are
+    dropped, neither imported nor found.
+    """
+    return (
+        not isinstance(operation, SimpleOperation)
+        or operation.currency in state_index.raiffeisen_accounts
+    )
@@ -1,80 +1,159 @@
+import uuid
 from dataclasses import dataclass
 from typing import Self
 
-from services.emails_statements.statement import RawOperation
+from services.emails_statements.statement import (
+    MINOR_UNITS,
+    RawOperation,
+    iso_date,
+)
 
+# Namespace of UUIDv5 ids given to imported transactions
+IMPORT_ID_NAMESPACE = uuid.UUID("99a4f413-627b-45bb-8ba2-671c68798211")
 
-@dataclass
+
+def make_import_id(*parts: object) -> str:
+    """Deterministic transaction id, the same on every import of the parts"""
+    return str(uuid.uuid5(IMPORT_ID_NAMESPACE, "|".join(map(str, parts))))
+
+
+def raw_import_id(raw_operation: RawOperation, account_number: str) -> str:
+    return make_import_id(
+        account_number,
+        raw_operation.reference,
+        raw_operation.date_ordinal,
+        raw_operation.amount_minor,
+    )
+
+
+@dataclass(frozen=True, slots=True)
 class SimpleOperation:
     customer: str
-    amount: float
+    amount_minor: int
     currency: str
-    date: str
+    date_ordinal: int
+    import_id: str = ""
+    # Category id from category_config, found when the operation was classified
+    category: str | None = None
+
+    @property
+    def amount(self) -> float:
+        return self.amount_minor / MINOR_UNITS
+
+    @property
+    def date(self) -> str:
+        return iso_date(self.date_ordinal)
 
     @classmethod
-    def from_raw(cls, raw_operation: RawOperation) -> Self:
+    def from_raw(
+        cls,
+        raw_operation: RawOperation,
+        import_id: str = "",
+        category: str | None = None,
+    ) -> Self:
         return cls(
             customer=raw_operation.customer,
-            amount=raw_operation.amount,
+            amount_minor=raw_operation.amount_minor,
             currency=raw_operation.currency,
-            date=raw_operation.data,
+            date_ordinal=raw_operation.date_ordinal,
+            import_id=import_id,
+            category=category,
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class TransitionOperation:
-    from_amount: float
+    from_amount_minor: int
     from_currency: str
 
-    to_amount: float
+    to_amount_minor: int
     to_currency: str
 
-    date: str
+    date_ordinal: int
+    import_id: str = ""
+
+    @property
+    def from_amount(self) -> float:
+        return self.from_amount_minor / MINOR_UNITS
+
+    @property
+    def to_amount(self) -> float:
+        return self.to_amount_minor / MINOR_UNITS
+
+    @property
+    def date(self) -> str:
+        return iso_date(self.date_ordinal)
 
     @classmethod
-    def from_raw(cls, from_operation: RawOperation, to_operation: RawOperation) -> Self:
+    def from_raw(
+        cls,
+        from_operation: RawOperation,
+        to_operation: RawOperation,
+        import_id: str = "",
+    ) -> Self:
         return cls(
-            from_amount=from_operation.amount,
+            from_amount_minor=from_operation.amount_minor,
             from_currency=from_operation.currency,
-            to_amount=to_operation.amount,
+            to_amount_minor=to_operation.amount_minor,
             to_currency=to_operation.currency,
-            date=from_operation.data,
+            date_ordinal=from_operation.date_ordinal,
+            import_id=import_id,
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class DeelTransferOperation:
     """Transfer operation from Deel to bank account"""
 
     customer: str
-    amount: float
+    amount_minor: int
     currency: str
-    date: str
+    date_ordinal: int
+    import_id: str = ""
+
+    @property
+    def amount(self) -> float:
+        return self.amount_minor / MINOR_UNITS
+
+    @property
+    def date(self) -> str:
+        return iso_date(self.date_ordinal)
 
     @classmethod
-    def from_raw(cls, raw_operation: RawOperation) -> Self:
+    def from_raw(cls, raw_operation: RawOperation, import_id: str = "") -> Self:
         return cls(
             customer=raw_operation.customer,
-            amount=raw_operation.amount,
+            amount_minor=raw_operation.amount_minor,
             currency=raw_operation.currency,
-            date=raw_operation.data,
+            date_ordinal=raw_operation.date_ordinal,
+            import_id=import_id,
         )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class CashWithdrawalOperation:
     """Cash withdrawal operation from ATM or bank branch"""
 
     customer: str
-    amount: float
+    amount_minor: int
     currency: str
-    date: str
+    date_ordinal: int
+    import_id: str = ""
+
+    @property
+    def amount(self) -> float:
+        return self.amount_minor / MINOR_UNITS
+
+    @property
+    def date(self) -> str:
+        return iso_date(self.date_ordinal)
 
     @classmethod
-    def from_raw(cls, raw_operation: RawOperation) -> Self:
+    def from_raw(cls, raw_operation: RawOperation, import_id: str = "") -> Self:
         return cls(
             customer=raw_operation.customer,
-            amount=raw_operation.amount,
+            amount_minor=raw_operation.amount_minor,
             currency=raw_operation.currency,
-            date=raw_operation.data,
+            date_ordinal=raw_operation.date_ordinal,
+            import_id=import_id,
         )
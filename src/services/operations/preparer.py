@@ -1,16 +1,28 @@
-from services.emails_statements.statement import RawOperation, Statement
+from collections import defaultdict
+from typing import Iterable
+
+import metrics
+from services.emails_statements.statement import (
+    RawOperation,
+    Statement,
+    StatementStream,
+)
+from services.operations.classifier import OperationClassifier
 from services.operations.operations import (
     CashWithdrawalOperation,
     DeelTransferOperation,
     SimpleOperation,
     TransitionOperation,
+    make_import_id,
+    raw_import_id,
 )
 
 
 def prepare_operations(
-    statements: list[Statement],
+    statements: Iterable[Statement | StatementStream],
     deel_config: dict | None = None,
     cash_withdrawal_config: dict | None = None,
+    category_config: dict[str, str] | None = None,
 ) -> list[
     SimpleOperation
     | TransitionOperation
@@ -25,166 +37,204 @@ def prepare_operations(
     duplicates_count = 0
 
     for statement in statements:
-        for raw_operation in statement.operations:
-            # Создаем уникальный ключ для операции
-            operation_key = (
-                raw_operation.data,
-                raw_operation.amount,
-                raw_operation.currency,
-                raw_operation.customer,
-                raw_operation.reference,
-                raw_operation.description,
-            )
-
-            # Пропускаем дубликаты
-            if operation_key in seen_operations:
-                duplicates_count += 1
-                print(
-                    f"ДУБЛИКАТ: {raw_operation.data} - {raw_operation.amount} {raw_operation.currency} - {raw_operation.customer}"
+        with metrics.stage("dedup") as dedup:
+            received = 0
+            for raw_operation in statement.operations:
+                received += 1
+                # Создаем уникальный ключ для операции
+                operation_key = (
+                    raw_operation.date_ordinal,
+                    raw_operation.amount_minor,
+                    raw_operation.currency,
+                    raw_operation.customer,
+                    raw_operation.reference,
+                    raw_operation.description,
                 )
-                continue
 
-            seen_operations.add(operation_key)
-            all_raw_operations.append((raw_operation, statement.account_number))
+                # Пропускаем дубликаты
+                if operation_key in seen_operations:
+                    duplicates_count += 1
+                    print(
+                        f"ДУБЛИКАТ: {raw_operation.date} - {raw_operation.amount} {raw_operation.currency} - {raw_operation.customer}"
+                    )
+                    continue
+
+                seen_operations.add(operation_key)
+                all_raw_operations.append((raw_operation, statement.account_number))
+            dedup.count("in", received)
 
+    metrics.count("dedup", "out", len(all_raw_operations))
     if duplicates_count > 0:
         print(f"\nОбнаружено и пропущено дубликатов: {duplicates_count}")
 
-    processed_operations = set()
-
-    for i, (op1, acc1) in enumerate(all_raw_operations):
-        if id(op1) in processed_operations:
-            continue
-
-        for j, (op2, acc2) in enumerate(all_raw_operations[i + 1 :], i + 1):
-            if id(op2) in processed_operations:
-                continue
-
-            if _are_operations_linked(op1, op2):
-                if (
-                    op1.currency != op2.currency
-                    and (
-                        (op1.amount < 0 and op2.amount > 0)
-                        or (op1.amount > 0 and op2.amount < 0)
-                    )
-                    and (_is_currency_exchange(op1) or _is_currency_exchange(op2))
-                ):
-                    if op1.amount < 0:
-                        from_op, to_op = op1, op2
-                    else:
-                        from_op, to_op = op2, op1
-
-                    transition_op = TransitionOperation.from_raw(from_op, to_op)
-                    operations.append(transition_op)
-
-                    processed_operations.add(id(op1))
-                    processed_operations.add(id(op2))
-                    break
-
-    for raw_operation, account_number in all_raw_operations:
-        if id(raw_operation) not in processed_operations:
+    with metrics.stage("classify"):
+        # Детерминированные id: повторный импорт перезапишет транзакцию, а не задублирует
+        import_ids = []
+        id_occurrences: dict[str, int] = defaultdict(int)
+        for raw_operation, account_number in all_raw_operations:
+            import_id = raw_import_id(raw_operation, account_number)
+            id_occurrences[import_id] += 1
+            if id_occurrences[import_id] > 1:
+                # Операции с одинаковыми ссылкой, датой и суммой различаем по порядку
+                import_id = make_import_id(import_id, id_occurrences[import_id])
+            import_ids.append(import_id)
+
+        # Все ключевые слова проверяются за один проход по каждой операции
+        classifier = OperationClassifier(
+            deel_config, cash_withdrawal_config, category_config
+        )
+        classifications = [
+            classifier.classify(raw_operation)
+            for raw_operation, _ in all_raw_operations
+        ]
+
+    with metrics.stage("pairing") as pairing:
+        transition_operations, processed_operations = _pair_currency_exchanges(
+            [raw_operation for raw_operation, _ in all_raw_operations],
+            [classification.exchange for classification in classifications],
+            import_ids,
+        )
+        pairing.count("transitions", len(transition_operations))
+    operations.extend(transition_operations)
+
+    for index, (raw_operation, account_number) in enumerate(all_raw_operations):
+        if index not in processed_operations:
             # Проверяем, является ли это переводом от Deel
-            if deel_config and _is_deel_transfer(raw_operation, deel_config):
-                deel_op = DeelTransferOperation.from_raw(raw_operation)
+            if classifications[index].deel:
+                deel_op = DeelTransferOperation.from_raw(
+                    raw_operation, import_ids[index]
+                )
                 operations.append(deel_op)
             # Проверяем, является ли это снятием наличных
-            elif cash_withdrawal_config and _is_cash_withdrawal(
-                raw_operation, cash_withdrawal_config
-            ):
-                cash_withdrawal_op = CashWithdrawalOperation.from_raw(raw_operation)
+            elif classifications[index].cash:
+                cash_withdrawal_op = CashWithdrawalOperation.from_raw(
+                    raw_operation, import_ids[index]
+                )
                 operations.append(cash_withdrawal_op)
             else:
-                simple_op = SimpleOperation.from_raw(raw_operation)
+                simple_op = SimpleOperation.from_raw(
+                    raw_operation, import_ids[index], classifications[index].category
+                )
                 operations.append(simple_op)
 
     return operations
 
 
-def _are_operations_linked(op1: RawOperation, op2: RawOperation) -> bool:
-    """Check if two operations are linked (by references or descriptions)"""
-
-    if op1.reference and op2.reference and op1.reference == op2.reference:
-        return True
-
-    if op1.reference and op1.reference in op2.description:
-        return True
-
-    if op2.reference and op2.reference in op1.description:
-        return True
-
-    return False
-
-
-def _is_currency_exchange(operation: RawOperation) -> bool:
-    """Check if operation is a currency exchange"""
-    description_lower = operation.description.lower()
-    customer_lower = operation.customer.lower()
+def _pair_currency_exchanges(
+    raw_operations: list[RawOperation],
+    exchange_flags: list[bool],
+    import_ids: list[str] | None = None,
+) -> tuple[list[TransitionOperation], set[int]]:
+    """Pair currency exchange legs using reference indexes.
+
+    exchange_flags tells which operations look like a currency exchange;
+    a transition's import id is derived from the import ids of its legs.
+
+    Every operation is checked only against operations that share its
+    reference or mention it in the description (or vice versa), in the
+    same order the exhaustive pairwise scan would visit them.
+    """
+
+    by_reference: dict[str, list[int]] = defaultdict(list)
+    for index, operation in enumerate(raw_operations):
+        if operation.reference:
+            by_reference[operation.reference].append(index)
+
+    reference_lengths = sorted({len(reference) for reference in by_reference})
+
+    # Ссылки, упомянутые в описании каждой операции
+    mentioned_references: list[set[str]] = []
+    by_mentioned_reference: dict[str, list[int]] = defaultdict(list)
+    for index, operation in enumerate(raw_operations):
+        mentioned = _extract_references(
+            operation.description, by_reference, reference_lengths
+        )
+        mentioned_references.append(mentioned)
+        for reference in mentioned:
+            by_mentioned_reference[reference].append(index)
+
+    transition_operations = []
+    processed_operations: set[int] = set()
+
+    for i, op1 in enumerate(raw_operations):
+        if i in processed_operations:
+            continue
 
-    # Exclude cash withdrawals - they have card numbers in description
-    if "******" in operation.description:
-        return False
+        candidates = set()
+        if op1.reference:
+            candidates.update(by_reference[op1.reference])
+            candidates.update(by_mentioned_reference.get(op1.reference, ()))
+        for reference in mentioned_references[i]:
+            candidates.update(by_reference[reference])
 
-    exchange_keywords = [
-        "otkup",
-        "kupoprodaja deviza",
-        "dinarska protivvrednost",
-        "po kursu",
-        "protivvrednost",
-    ]
+        for j in sorted(candidates):
+            if j <= i or j in processed_operations:
+                continue
 
-    return (
-        any(keyword in description_lower for keyword in exchange_keywords)
-        or "raiffeisen banka" in customer_lower
-    )
+            op2 = raw_operations[j]
+            if _are_operations_linked(op1, op2) and _is_exchange_pair(
+                op1, op2, exchange_flags[i] or exchange_flags[j]
+            ):
+                from_index, to_index = (i, j) if op1.amount_minor < 0 else (j, i)
+                import_id = (
+                    make_import_id(import_ids[from_index], import_ids[to_index])
+                    if import_ids
+                    else ""
+                )
 
+                transition_operations.append(
+                    TransitionOperation.from_raw(
+                        raw_operations[from_index], raw_operations[to_index], import_id
+                    )
+                )
 
-def _is_deel_transfer(operation: RawOperation, deel_config: dict) -> bool:
-    """Check if operation is a transfer from Deel"""
-    if not deel_config.get("enabled", False):
-        return False
+                processed_operations.add(i)
+                processed_operations.add(j)
+                break
 
-    # Check only incoming payments
-    if operation.amount <= 0:
-        return False
+    return transition_operations, processed_operations
 
-    # Get keywords for search
-    keywords = deel_config.get("keywords", [])
-    if not keywords:
-        return False
 
-    # Check for keywords in customer or description
-    customer_lower = operation.customer.lower()
-    description_lower = operation.description.lower()
+def _extract_references(
+    description: str,
+    by_reference: dict[str, list[int]],
+    reference_lengths: list[int],
+) -> set[str]:
+    """Find all known references that occur as substrings of description"""
+    found = set()
+    for length in reference_lengths:
+        for start in range(len(description) - length + 1):
+            token = description[start : start + length]
+            if token in by_reference:
+                found.add(token)
+    return found
 
-    for keyword in keywords:
-        keyword_lower = keyword.lower()
-        if keyword_lower in customer_lower or keyword_lower in description_lower:
-            return True
 
-    return False
+def _is_exchange_pair(op1: RawOperation, op2: RawOperation, exchange: bool) -> bool:
+    """Check if two linked operations are opposite legs of a currency exchange.
 
+    exchange tells whether either of them looks like a currency exchange.
+    """
+    return (
+        op1.currency != op2.currency
+        and (
+            op1.amount_minor < 0 < op2.amount_minor
+            or op2.amount_minor < 0 < op1.amount_minor
+        )
+        and exchange
+    )
 
-def _is_cash_withdrawal(operation: RawOperation, cash_withdrawal_config: dict) -> bool:
-    """Check if operation is a cash withdrawal from ATM or bank branch"""
-    if not cash_withdrawal_config.get("enabled", False):
-        return False
 
-    # Check only outgoing payments (withdrawals)
-    if operation.amount >= 0:
-        return False
+def _are_operations_linked(op1: RawOperation, op2: RawOperation) -> bool:
+    """Check if two operations are linked (by references or descriptions)"""
 
-    # Get keywords for search
-    keywords = cash_withdrawal_config.get("keywords", [])
-    if not keywords:
-        return False
+    if op1.reference and op2.reference and op1.reference == op2.reference:
+        return True
 
-    # Check for keywords in customer or description
-    customer_lower = operation.customer.lower()
-    description_lower = operation.description.lower()
+    if op1.reference and op1.reference in op2.description:
+        return True
 
-    for keyword in keywords:
-        keyword_lower = keyword.lower()
-        if keyword_lower in customer_lower or keyword_lower in description_lower:
-            return True
+    if op2.reference and op2.reference in op1.description:
+        return True
 
     return False
@@ -0,0 +1,122 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+# Consumed prefix of the buffer is dropped once it grows over this size
+_COMPACT_AT = 1 << 16
+_WHITESPACE = " \t\r\n"
+_NUMBER = "0123456789+-.eE"
+
+
+class DiffStreamError(ValueError):
+    """Malformed /v8/diff/ response body"""
+
+
+def iter_diff_items(chunks: Iterable[bytes]) -> Iterator[tuple[str, Any]]:
+    """Decode a /v8/diff/ JSON object from byte chunks incrementally.
+
+    Yields (key, value) for top-level scalars and (key, item) for every
+    element of top-level arrays, so the `transaction` array is never held
+    in memory as a whole. `null` array values are yielded as (key, None).
+    """
+    reader = _Reader(chunks)
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise DiffStreamError(f"Expected object key, got {key!r}")
+        reader.expect(":")
+
+        if reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield key, reader.value()
+                    if reader.next_of(",]") == "]":
+                        break
+        else:
+            yield key, reader.value()
+
+        if reader.next_of(",}") == "}":
+            return
+
+
+class _Reader:
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def peek(self) -> str:
+        """Next non-whitespace character, without consuming it"""
+        while True:
+            while self._pos < len(self._buffer):
+                if self._buffer[self._pos] not in _WHITESPACE:
+                    return self._buffer[self._pos]
+                self._pos += 1
+            if not self._fill():
+                raise DiffStreamError("Unexpected end of response")
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise DiffStreamError(f"Expected {char!r} at offset {self._pos}")
+        self._pos += 1
+
+    def next_of(self, chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise DiffStreamError(f"Expected one of {chars!r} at offset {self._pos}")
+        self._pos += 1
+        return char
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if self._fill():
+                    continue
+                raise DiffStreamError(f"Malformed value at offset {e.pos}") from e
+
+            # A number cut by the chunk boundary decodes as its prefix
+            if (
+                isinstance(value, (int, float))
+                and (end == len(self._buffer) or self._buffer[end] in _NUMBER)
+                and self._fill()
+            ):
+                continue
+
+            self._pos = end
+            return value
+
+    def _fill(self) -> bool:
+        """Append the next chunk to the buffer, False at the end of input"""
+        if self._eof:
+            return False
+
+        if self._pos > _COMPACT_AT:
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
+
+        try:
+            for chunk in self._chunks:
+                text = self._decoder.decode(chunk)
+                if text:
+                    self._buffer += text
+                    return True
+
+            self._eof = True
+            self._buffer += self._decoder.decode(b"", final=True)
+        except UnicodeDecodeError as e:
+            raise DiffStreamError("Response is not valid UTF-8") from e
+        return False
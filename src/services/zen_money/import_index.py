@@ -0,0 +1,211 @@
+import mmap
+import struct
+import uuid
+from pathlib import Path
+from typing import Iterable
+
+_KEY_SIZE = 16
+# magic, version, bit count, hash count
+_BLOOM_HEADER = struct.Struct("<4sIQI")
+_BLOOM_MAGIC = b"RZBF"
+_BLOOM_VERSION = 1
+_BLOOM_HASHES = 7
+# ~10 bits per key with 7 hashes gives about 1% false positives
+_BLOOM_BITS_PER_KEY = 10
+_BLOOM_MIN_BITS = 1 << 16
+
+
+class ImportIndex:
+    """Ids of every transaction ever pushed, persisted across runs.
+
+    Ids are kept as sorted 16-byte UUIDs in a memory-mapped key file,
+    behind a Bloom filter: an id that was never imported is rejected
+    without touching the key file, a possible hit is confirmed by binary
+    search. Added ids stay pending until save().
+    """
+
+    KEYS_FILENAME = "import_ids.bin"
+    BLOOM_FILENAME = "import_ids.bloom"
+
+    def __init__(self, directory: Path):
+        self._keys_path = directory / self.KEYS_FILENAME
+        self._bloom_path = directory / self.BLOOM_FILENAME
+        self._pending: set[bytes] = set()
+
+        self._keys = _map(self._keys_path)
+        self._bloom = _Bloom.load(self._bloom_path)
+        if self._bloom is None or self._bloom.capacity < len(self):
+            self._bloom = self._build_bloom(len(self))
+
+    def __len__(self) -> int:
+        return len(self._keys) // _KEY_SIZE if self._keys else 0
+
+    def __contains__(self, import_id: str) -> bool:
+        try:
+            key = uuid.UUID(import_id).bytes
+        except ValueError:
+            # Not a UUID, so none of ours (ids of other apps may be anything)
+            return False
+
+        if key in self._pending:
+            return True
+        if not self._bloom.might_contain(key):
+            return False
+        return self._search(key)
+
+    def add(self, import_ids: Iterable[str]) -> None:
+        for import_id in import_ids:
+            if import_id:
+                self._pending.add(uuid.UUID(import_id).bytes)
+
+    def save(self) -> None:
+        """Merge pending ids into the key file and the Bloom filter"""
+        new_keys = sorted(key for key in self._pending if not self._search(key))
+        self._pending.clear()
+        if not new_keys:
+            return
+
+        keys = _merge(self._keys or b"", new_keys)
+        count = len(keys) // _KEY_SIZE
+
+        if self._bloom.capacity < count:
+            self._bloom = _Bloom.for_keys(count)
+            new_keys = _iter_keys(keys)
+        for key in new_keys:
+            self._bloom.add(key)
+
+        self._close()
+        self._keys_path.parent.mkdir(parents=True, exist_ok=True)
+        # Filter first: extra bits only cost a lookup, missing ones lose ids
+        _write(self._bloom_path, self._bloom.dump())
+        _write(self._keys_path, keys)
+        self._keys = _map(self._keys_path)
+
+    def close(self) -> None:
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _build_bloom(self, count: int) -> "_Bloom":
+        bloom = _Bloom.for_keys(count)
+        for key in _iter_keys(self._keys or b""):
+            bloom.add(key)
+        return bloom
+
+    def _search(self, key: bytes) -> bool:
+        keys = self._keys
+        if not keys:
+            return False
+
+        low, high = 0, len(keys) // _KEY_SIZE
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * _KEY_SIZE
+            current = keys[offset : offset + _KEY_SIZE]
+            if current == key:
+                return True
+            if current < key:
+                low = middle + 1
+            else:
+                high = middle
+        return False
+
+    def _close(self) -> None:
+        if self._keys:
+            self._keys.close()
+        self._keys = None
+
+
+class _Bloom:
+    def __init__(self, bits: bytearray, hashes: int = _BLOOM_HASHES):
+        self.bits = bits
+        self.size = len(bits) * 8
+        self.hashes = hashes
+
+    @property
+    def capacity(self) -> int:
+        return self.size // _BLOOM_BITS_PER_KEY
+
+    @classmethod
+    def for_keys(cls, count: int) -> "_Bloom":
+        size = max(_BLOOM_MIN_BITS, count * 2 * _BLOOM_BITS_PER_KEY)
+        return cls(bytearray((size + 7) // 8))
+
+    @classmethod
+    def load(cls, path: Path) -> "_Bloom | None":
+        try:
+            data = path.read_bytes()
+            magic, version, size, hashes = _BLOOM_HEADER.unpack_from(data)
+        except (FileNotFoundError, struct.error):
+            return None
+        bits = bytearray(data[_BLOOM_HEADER.size :])
+        if magic != _BLOOM_MAGIC or version != _BLOOM_VERSION or size != len(bits) * 8:
+            return None
+        return cls(bits, hashes)
+
+    def dump(self) -> bytes:
+        header = _BLOOM_HEADER.pack(
+            _BLOOM_MAGIC, _BLOOM_VERSION, self.size, self.hashes
+        )
+        return header + bytes(self.bits)
+
+    def add(self, key: bytes) -> None:
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, key: bytes) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def _positions(self, key: bytes):
+        # UUIDv5 ids are SHA-1 based, their halves are already good hashes
+        first = int.from_bytes(key[:8], "little")
+        second = int.from_bytes(key[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+
+def _map(path: Path) -> mmap.mmap | None:
+    try:
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (FileNotFoundError, ValueError):
+        # ValueError: an empty file cannot be mapped
+        return None
+
+
+def _iter_keys(keys: bytes | mmap.mmap):
+    for offset in range(0, len(keys), _KEY_SIZE):
+        yield keys[offset : offset + _KEY_SIZE]
+
+
+def _merge(keys: bytes | mmap.mmap, new_keys: list[bytes]) -> bytes:
+    """Merge sorted new keys into a sorted key file content"""
+    merged = bytearray()
+    position = 0
+    for key in new_keys:
+        # Copy the run of existing keys smaller than key in one slice
+        low, high = position // _KEY_SIZE, len(keys) // _KEY_SIZE
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * _KEY_SIZE
+            if keys[offset : offset + _KEY_SIZE] < key:
+                low = middle + 1
+            else:
+                high = middle
+        merged += keys[position : low * _KEY_SIZE]
+        merged += key
+        position = low * _KEY_SIZE
+    merged += keys[position:]
+    return bytes(merged)
+
+
+def _write(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
@@ -0,0 +1,72 @@
+import json
+from pathlib import Path
+from typing import Iterable
+
+from services.zen_money.zen_money_api import TransactionSummary
+
+
+class PayeeCategoryStore:
+    """Payee -> category map learned from categorized ZenMoney transactions.
+
+    Payees are matched exactly (case-insensitive). When a payee was tagged
+    differently over time, the most recently changed transaction wins.
+    """
+
+    FILENAME = "payee_categories.json"
+
+    def __init__(self, directory: Path):
+        self._path = directory / self.FILENAME
+        # normalized payee -> (category id, changed timestamp)
+        self._categories: dict[str, tuple[str, int]] = {}
+        self._dirty = False
+
+        if self._path.exists():
+            with open(self._path, "r", encoding="utf-8") as f:
+                self._categories = {
+                    payee: (category, changed)
+                    for payee, (category, changed) in json.load(f).items()
+                }
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    def get(self, payee: str | None) -> str | None:
+        if not payee:
+            return None
+        learned = self._categories.get(_normalize(payee))
+        return learned[0] if learned else None
+
+    def learn(self, payee: str | None, category: str, changed: int = 0) -> None:
+        if not payee:
+            return
+        key = _normalize(payee)
+        learned = self._categories.get(key)
+        if learned is None or (learned[0] != category and learned[1] <= changed):
+            self._categories[key] = (category, changed)
+            self._dirty = True
+
+    def learn_from_transactions(
+        self, transactions: Iterable[TransactionSummary]
+    ) -> int:
+        """Remember the first tag of every categorized transaction"""
+        learned = len(self._categories)
+        for transaction in transactions:
+            if transaction.deleted or not transaction.tag:
+                continue
+            for payee in {transaction.payee, transaction.originalPayee}:
+                self.learn(payee, transaction.tag[0], transaction.changed)
+        return len(self._categories) - learned
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._categories, f, ensure_ascii=False)
+        tmp_path.replace(self._path)
+        self._dirty = False
+
+
+def _normalize(payee: str) -> str:
+    return " ".join(payee.split()).casefold()
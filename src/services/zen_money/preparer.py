@@ -1,13 +1,15 @@
 import uuid
 from datetime import datetime
 
-from envs import CATEGORY_CONFIG, CURRENCY_CONFIG, DEEL_CONFIG, USER_ID
+from config import Profile
+from envs import DEFAULT_PROFILE
 from services.operations.operations import (
     CashWithdrawalOperation,
     DeelTransferOperation,
     SimpleOperation,
     TransitionOperation,
 )
+from services.zen_money.payee_categories import PayeeCategoryStore
 from services.zen_money.zen_money_api import NewZenMoneyState, Transaction
 
 
@@ -18,25 +20,32 @@ def prepare_new_state(
         | DeelTransferOperation
         | CashWithdrawalOperation
     ],
+    payee_categories: PayeeCategoryStore | None = None,
+    profile: Profile = DEFAULT_PROFILE,
 ) -> NewZenMoneyState:
+    """Build transactions of the profile's ZenMoney user from operations"""
     current_timestamp = int(datetime.now().timestamp())
     transactions = []
 
     for operation in operations:
         if isinstance(operation, SimpleOperation):
-            transaction = _create_simple_transaction(operation, current_timestamp)
+            transaction = _create_simple_transaction(
+                operation, current_timestamp, profile, payee_categories
+            )
             transactions.append(transaction)
         elif isinstance(operation, TransitionOperation):
-            transaction = _create_transition_transaction(operation, current_timestamp)
+            transaction = _create_transition_transaction(
+                operation, current_timestamp, profile
+            )
             transactions.append(transaction)
         elif isinstance(operation, DeelTransferOperation):
             transaction = _create_deel_transfer_transaction(
-                operation, current_timestamp
+                operation, current_timestamp, profile
             )
             transactions.append(transaction)
         elif isinstance(operation, CashWithdrawalOperation):
             transaction = _create_cash_withdrawal_transaction(
-                operation, current_timestamp
+                operation, current_timestamp, profile
             )
             transactions.append(transaction)
 
@@ -47,36 +56,46 @@ def prepare_new_state(
     )
 
 
-def _get_category_for_payee(payee: str) -> list[str]:
-    if not payee:
-        return []
+def _get_currency_config(
+    currency: str,
+    profile: Profile,
+    fallback: str = "RSD",
+) -> dict:
+    """Currency config, or the fallback currency's when it is not configured"""
+    return profile.currency_config.get(currency) or profile.currency_config[fallback]
 
-    for key, category_id in CATEGORY_CONFIG.items():
-        if key.upper() in payee.upper():
-            return [category_id]
 
-    return []
+def _get_category_for_payee(
+    operation: SimpleOperation,
+    payee_categories: PayeeCategoryStore | None = None,
+) -> list[str]:
+    """Category from category_config, then from categories learned in ZenMoney"""
+    category_id = operation.category
+    if category_id is None and payee_categories is not None:
+        category_id = payee_categories.get(operation.customer)
+    return [category_id] if category_id else []
 
 
 def _create_simple_transaction(
-    operation: SimpleOperation, current_timestamp: int
+    operation: SimpleOperation,
+    current_timestamp: int,
+    profile: Profile,
+    payee_categories: PayeeCategoryStore | None = None,
 ) -> Transaction:
     is_income = operation.amount > 0
     abs_amount = abs(operation.amount)
 
-    currency_config = CURRENCY_CONFIG.get(operation.currency)
-    if not currency_config:
-        currency_config = CURRENCY_CONFIG["RSD"]
+    currency_config = _get_currency_config(operation.currency, profile)
 
     instrument_id = currency_config["instrument_id"]
     bank_account_id = currency_config["account_id"]
     cash_account_id = currency_config.get("cash_account_id", bank_account_id)
 
-    categories = _get_category_for_payee(operation.customer)
+    categories = _get_category_for_payee(operation, payee_categories)
 
     return Transaction(
-        id=str(uuid.uuid4()),
-        user=USER_ID,
+        id=operation.import_id or str(uuid.uuid4()),
+        user=profile.zen_money_user_id,
         date=operation.date,
         income=abs_amount if is_income else 0.0,
         outcome=abs_amount if not is_income else 0.0,
@@ -96,17 +115,19 @@ def _create_simple_transaction(
 
 
 def _create_transition_transaction(
-    operation: TransitionOperation, current_timestamp: int
+    operation: TransitionOperation,
+    current_timestamp: int,
+    profile: Profile,
 ) -> Transaction:
     from_amount = abs(operation.from_amount)
     to_amount = abs(operation.to_amount)
 
-    from_config = CURRENCY_CONFIG.get(operation.from_currency, CURRENCY_CONFIG["RSD"])
-    to_config = CURRENCY_CONFIG.get(operation.to_currency, CURRENCY_CONFIG["RSD"])
+    from_config = _get_currency_config(operation.from_currency, profile)
+    to_config = _get_currency_config(operation.to_currency, profile)
 
     return Transaction(
-        id=str(uuid.uuid4()),
-        user=USER_ID,
+        id=operation.import_id or str(uuid.uuid4()),
+        user=profile.zen_money_user_id,
         date=operation.date,
         income=to_amount,
         outcome=from_amount,
@@ -125,24 +146,24 @@ def _create_transition_transaction(
 
 
 def _create_deel_transfer_transaction(
-    operation: DeelTransferOperation, current_timestamp: int
+    operation: DeelTransferOperation,
+    current_timestamp: int,
+    profile: Profile,
 ) -> Transaction:
     """Create transfer transaction from Deel to bank account"""
     abs_amount = abs(operation.amount)
 
     # Get configuration for bank account currency (where money is received)
-    bank_currency_config = CURRENCY_CONFIG.get(operation.currency)
-    if not bank_currency_config:
-        bank_currency_config = CURRENCY_CONFIG["RSD"]
+    bank_currency_config = _get_currency_config(operation.currency, profile)
 
     # Get Deel configuration
-    deel_account_id = DEEL_CONFIG.get("account_id")
-    deel_currency = DEEL_CONFIG.get("currency", "USD")
-    deel_currency_config = CURRENCY_CONFIG.get(deel_currency, CURRENCY_CONFIG["USD"])
+    deel_account_id = profile.deel_config.get("account_id")
+    deel_currency = profile.deel_config.get("currency", "USD")
+    deel_currency_config = _get_currency_config(deel_currency, profile, fallback="USD")
 
     return Transaction(
-        id=str(uuid.uuid4()),
-        user=USER_ID,
+        id=operation.import_id or str(uuid.uuid4()),
+        user=profile.zen_money_user_id,
         date=operation.date,
         income=abs_amount,
         outcome=abs_amount,
@@ -162,23 +183,23 @@ def _create_deel_transfer_transaction(
 
 
 def _create_cash_withdrawal_transaction(
-    operation: CashWithdrawalOperation, current_timestamp: int
+    operation: CashWithdrawalOperation,
+    current_timestamp: int,
+    profile: Profile,
 ) -> Transaction:
     """Create transfer transaction for cash withdrawal from bank to cash account"""
     abs_amount = abs(operation.amount)
 
     # Get configuration for the currency
-    currency_config = CURRENCY_CONFIG.get(operation.currency)
-    if not currency_config:
-        currency_config = CURRENCY_CONFIG["RSD"]
+    currency_config = _get_currency_config(operation.currency, profile)
 
     instrument_id = currency_config["instrument_id"]
     bank_account_id = currency_config["account_id"]
     cash_account_id = currency_config.get("cash_account_id", bank_account_id)
 
     return Transaction(
-        id=str(uuid.uuid4()),
-        user=USER_ID,
+        id=operation.import_id or str(uuid.uuid4()),
+        user=profile.zen_money_user_id,
         date=operation.date,
         income=abs_amount,
         outcome=abs_amount,
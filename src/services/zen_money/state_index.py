@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from typing import Self
+
+from services.zen_money.zen_money_api import (
+    Account,
+    Instrument,
+    ZenMoneyStateSummary,
+)
+
+RAIFFEISEN_ACCOUNT_PREFIX = "Raiffeizen B"
+
+
+@dataclass
+class ZenMoneyStateIndex:
+    """Lookup tables over the ZenMoney state, built once per state"""
+
+    instruments: dict[int, Instrument]
+    # Instrument id -> position in the state instrument list
+    instrument_positions: dict[int, int]
+    accounts: dict[str, Account]
+    # Currency short title -> Raiffeisen account id
+    raiffeisen_accounts: dict[str, str]
+    raiffeisen_account_ids: frozenset[str]
+    # Ids of transactions that are not deleted
+    transaction_ids: frozenset[str]
+
+    @classmethod
+    def from_state(cls, state: ZenMoneyStateSummary) -> Self:
+        instruments = {}
+        instrument_positions = {}
+        for position, instrument in enumerate(state.instrument):
+            instruments.setdefault(instrument.id, instrument)
+            instrument_positions.setdefault(instrument.id, position)
+
+        accounts = {account.id: account for account in state.account}
+
+        raiffeisen_accounts = {}
+        for account in state.account:
+            if account.title.startswith(RAIFFEISEN_ACCOUNT_PREFIX):
+                instrument = instruments.get(account.instrument)
+                if instrument:
+                    raiffeisen_accounts[instrument.shortTitle] = account.id
+
+        return cls(
+            instruments=instruments,
+            instrument_positions=instrument_positions,
+            accounts=accounts,
+            raiffeisen_accounts=raiffeisen_accounts,
+            raiffeisen_account_ids=frozenset(raiffeisen_accounts.values()),
+            transaction_ids=frozenset(
+                transaction.id
+                for transaction in state.transaction
+                if not transaction.deleted
+            ),
+        )
+
+    def first_instrument(self, *instrument_ids: int) -> Instrument | None:
+        """Return the instrument listed first in the state among instrument_ids"""
+        known = [i for i in instrument_ids if i in self.instruments]
+        if not known:
+            return None
+        return self.instruments[min(known, key=self.instrument_positions.__getitem__)]
@@ -0,0 +1,226 @@
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List
+
+from pydantic import TypeAdapter
+
+import metrics
+from services.zen_money.zen_money_api import (
+    Account,
+    Instrument,
+    Transaction,
+    TransactionSummary,
+    ZenMoneyState,
+    ZenMoneyStateSummary,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS instrument (id INTEGER PRIMARY KEY, payload TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS account (id TEXT PRIMARY KEY, payload TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);
+"""
+
+# Diff entity name -> (table, model validated on merge)
+_ENTITIES = {
+    "instrument": ("instrument", Instrument),
+    "account": ("account", Account),
+    "transaction": ("transactions", TransactionSummary),
+}
+
+_TRANSACTION_SUMMARIES = TypeAdapter(List[TransactionSummary])
+
+# Streamed entities are written to the database in batches of this size
+MERGE_BATCH_SIZE = 1_000
+
+
+class ZenMoneyStateStore:
+    """SQLite copy of ZenMoney instruments, accounts and transactions.
+
+    Keeps the serverTimestamp of the last sync, so only the delta since
+    then has to be requested from /v8/diff/.
+    """
+
+    FILENAME = "zen_money.sqlite3"
+
+    def __init__(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(directory / self.FILENAME)
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    @property
+    def server_timestamp(self) -> int | None:
+        return self._get_meta("serverTimestamp")
+
+    @property
+    def history_start(self) -> int | None:
+        """Timestamp since which all changes are present in the store"""
+        return self._get_meta("historyStart")
+
+    def merge(
+        self,
+        diff: dict[str, Any] | Iterable[tuple[str, Any]],
+        history_start: int | None = None,
+    ) -> None:
+        """Apply a /v8/diff/ response: upsert changed entities, drop deletions.
+
+        diff is either the decoded response or a stream of (key, item)
+        pairs from iter_diff_items; streamed entities are written in
+        batches, so the response never has to be held in memory. Everything
+        is applied in one database transaction.
+
+        Transactions are stored as received; only the fields the import
+        reads are validated. history_start is the serverTimestamp a window
+        sync was requested with; the store then covers changes since the
+        earliest such window.
+        """
+        items = _diff_items(diff) if isinstance(diff, dict) else diff
+        rows: dict[str, list[tuple]] = {table: [] for table, _ in _ENTITIES.values()}
+        deletions = []
+        server_timestamp = None
+
+        with self._connection:
+            for name, value in items:
+                if name in _ENTITIES:
+                    if value is None:
+                        continue
+                    table, model = _ENTITIES[name]
+                    entity = model.model_validate(value)
+                    if table == "transactions":
+                        payload = json.dumps(value, ensure_ascii=False)
+                        rows[table].append((entity.id, entity.date, payload))
+                    else:
+                        rows[table].append((entity.id, entity.model_dump_json()))
+
+                    if len(rows[table]) >= MERGE_BATCH_SIZE:
+                        self._upsert(table, rows[table])
+                        rows[table] = []
+                elif name == "deletion":
+                    if value is not None:
+                        deletions.append(value)
+                elif name == "serverTimestamp":
+                    server_timestamp = value
+
+            if server_timestamp is None:
+                raise ValueError("Diff without serverTimestamp")
+
+            for table, table_rows in rows.items():
+                self._upsert(table, table_rows)
+
+            for deletion in deletions:
+                entity = _ENTITIES.get(deletion.get("object"))
+                if entity:
+                    self._connection.execute(
+                        f"DELETE FROM {entity[0]} WHERE id = ?", (deletion["id"],)
+                    )
+
+            self._set_meta("serverTimestamp", server_timestamp)
+            if history_start is not None:
+                current = self.history_start
+                self._set_meta(
+                    "historyStart",
+                    history_start if current is None else min(current, history_start),
+                )
+
+    def load(
+        self,
+        date_from: str | None = None,
+        date_to: str | None = None,
+        full: bool = False,
+    ) -> ZenMoneyStateSummary:
+        """Build the state from the stored entities (validated on merge).
+
+        date_from/date_to (ISO, inclusive) limit the loaded transactions.
+        Transactions are decoded into TransactionSummary in one pass over
+        the stored JSON, or into full Transaction models when full is set.
+        """
+        conditions, params = [], []
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        clause = f"{where} ORDER BY date"
+        with metrics.stage("state_load") as stage:
+            instruments = self._load("instrument", Instrument)
+            accounts = self._load("account", Account)
+
+            if full:
+                state = ZenMoneyState.model_construct(
+                    serverTimestamp=self.server_timestamp or 0,
+                    instrument=instruments,
+                    account=accounts,
+                    reminderMarker=[],
+                    transaction=self._load("transactions", Transaction, clause, params),
+                )
+            else:
+                payloads = self._connection.execute(
+                    f"SELECT payload FROM transactions {clause}", params
+                )
+                state = ZenMoneyStateSummary.model_construct(
+                    serverTimestamp=self.server_timestamp or 0,
+                    instrument=instruments,
+                    account=accounts,
+                    transaction=_TRANSACTION_SUMMARIES.validate_json(
+                        "[" + ",".join(payload for (payload,) in payloads) + "]"
+                    ),
+                )
+            stage.count("transactions", len(state.transaction))
+
+        return state
+
+    def _load(
+        self, table: str, model: type, clause: str = "", params: list = ()
+    ) -> list:
+        return [
+            model.model_construct(**json.loads(payload))
+            for (payload,) in self._connection.execute(
+                f"SELECT payload FROM {table} {clause}", params
+            )
+        ]
+
+    def _upsert(self, table: str, rows: list[tuple]) -> None:
+        if rows:
+            placeholders = ", ".join("?" * len(rows[0]))
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO {table} VALUES ({placeholders})", rows
+            )
+
+    def _get_meta(self, key: str) -> int | None:
+        row = self._connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return int(row[0]) if row else None
+
+    def _set_meta(self, key: str, value: int) -> None:
+        self._connection.execute(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, str(value))
+        )
+
+
+def _diff_items(diff: dict[str, Any]) -> Iterator[tuple[str, Any]]:
+    """Decoded diff as the (key, item) pairs iter_diff_items yields"""
+    for name, value in diff.items():
+        if isinstance(value, list):
+            for item in value:
+                yield name, item
+        else:
+            yield name, value
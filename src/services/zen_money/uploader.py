@@ -0,0 +1,168 @@
+import json
+import time
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+from envs import (
+    STORAGE_DIRECTORY,
+    ZEN_MONEY_API_KEY,
+    ZEN_MONEY_REQUEST_TIMEOUT,
+    ZEN_MONEY_UPLOAD_CHUNK_SIZE,
+    ZEN_MONEY_UPLOAD_MAX_RETRIES,
+)
+from services.zen_money.zen_money_api import (
+    API_URL,
+    NewZenMoneyState,
+    ZenMoneyAPIError,
+)
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class BatchUploader:
+    """Uploads NewZenMoneyState in chunks over one keep-alive session.
+
+    Throttled (429) and failed (5xx) requests are retried with exponential
+    backoff. Ids of the transactions in acknowledged chunks are kept in a
+    journal until the whole upload succeeds. Transaction ids are
+    deterministic, so a rerun after a failure skips the transactions the
+    server has already accepted, however the rest is split into chunks.
+    """
+
+    JOURNAL_FILENAME = "uploaded_transactions.json"
+
+    def __init__(
+        self,
+        journal_directory: Path | None = None,
+        chunk_size: int = ZEN_MONEY_UPLOAD_CHUNK_SIZE,
+        max_retries: int = ZEN_MONEY_UPLOAD_MAX_RETRIES,
+        backoff: float = 1.0,
+        timeout: float = ZEN_MONEY_REQUEST_TIMEOUT,
+        url: str = API_URL,
+        api_key: str = ZEN_MONEY_API_KEY,
+    ):
+        self._chunk_size = chunk_size
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._url = url
+
+        self._session = requests.Session()
+        self._session.headers["Authorization"] = f"Bearer {api_key}"
+        self._session.mount(self._url, HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+        self._journal_path = (
+            journal_directory / self.JOURNAL_FILENAME if journal_directory else None
+        )
+        self._acknowledged: list[str] = []
+        if self._journal_path and self._journal_path.exists():
+            with open(self._journal_path, "r", encoding="utf-8") as f:
+                self._acknowledged = json.load(f)
+
+    def close(self) -> None:
+        self._session.close()
+
+    def upload(self, state: NewZenMoneyState) -> list[dict]:
+        """Upload state chunk by chunk, return server responses of sent chunks"""
+        data = state_payload(state)
+        transactions = data.pop("transaction", None) or []
+
+        acknowledged = set(self._acknowledged)
+        new_transactions = [t for t in transactions if t["id"] not in acknowledged]
+        if len(new_transactions) < len(transactions):
+            skipped = len(transactions) - len(new_transactions)
+            print(f"Уже загружены ранее: {skipped} транзакций, пропускаем")
+            metrics.count("upload", "transactions_skipped", skipped)
+
+        chunks = [
+            new_transactions[start : start + self._chunk_size]
+            for start in range(0, len(new_transactions), self._chunk_size)
+        ]
+        responses = []
+        # Other entities go with the first request actually sent
+        payload_base = data
+
+        # Without transactions the other entities are still sent once
+        for chunk in chunks or [[]]:
+            payload = dict(payload_base)
+            payload_base = _base_payload(data)
+            if chunk:
+                payload["transaction"] = chunk
+
+            responses.append(self._post(payload))
+            metrics.count("upload", "chunks")
+            metrics.count("upload", "transactions", len(chunk))
+
+            if chunk:
+                self._acknowledged.extend(transaction["id"] for transaction in chunk)
+                self._save_journal()
+
+        # Все пакеты приняты - журнал для продолжения больше не нужен
+        self._acknowledged = []
+        self._save_journal()
+
+        return responses
+
+    def _post(self, payload: dict) -> dict:
+        for attempt in range(self._max_retries + 1):
+            if attempt:
+                metrics.count("upload", "retries")
+            try:
+                r = self._session.post(self._url, json=payload, timeout=self._timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self._max_retries:
+                    raise
+            else:
+                metrics.count("upload", "bytes_sent", len(r.request.body or b""))
+                if r.status_code == 200:
+                    return r.json()
+                if (
+                    r.status_code not in RETRY_STATUS_CODES
+                    or attempt == self._max_retries
+                ):
+                    raise ZenMoneyAPIError(r.status_code, r.text)
+
+            time.sleep(self._backoff * 2**attempt)
+
+    def _save_journal(self) -> None:
+        if self._journal_path:
+            self._journal_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._journal_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._acknowledged, f)
+            tmp_path.replace(self._journal_path)
+
+
+def create_uploader(
+    journal_directory: Path = STORAGE_DIRECTORY, api_key: str = ZEN_MONEY_API_KEY
+) -> BatchUploader:
+    return BatchUploader(journal_directory, api_key=api_key)
+
+
+def state_payload(state: NewZenMoneyState) -> dict:
+    """Serialize state for /v8/diff/, dropping empty entity lists"""
+    data = state.model_dump()
+
+    entity_fields = [
+        "instrument",
+        "account",
+        "budget",
+        "reminder",
+        "reminderMarker",
+        "deletion",
+    ]
+    for field in entity_fields:
+        if field in data and data[field] is None:
+            del data[field]
+
+    return data
+
+
+def _base_payload(data: dict) -> dict:
+    return {
+        "currentClientTimestamp": data["currentClientTimestamp"],
+        "serverTimestamp": data["serverTimestamp"],
+    }
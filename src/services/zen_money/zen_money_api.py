@@ -1,10 +1,30 @@
+import threading
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, List, Optional
 
 import requests
 from pydantic import BaseModel
 
-from envs import ZEN_MONEY_API_KEY
+import metrics
+from envs import ZEN_MONEY_API_KEY, ZEN_MONEY_REQUEST_TIMEOUT
+from services.zen_money.diff_stream import iter_diff_items
+
+if TYPE_CHECKING:
+    from services.zen_money.state_store import ZenMoneyStateStore
+
+API_URL = "https://api.zenmoney.ru/v8/diff/"
+DIFF_CHUNK_SIZE = 1 << 16
+
+# Keep-alive connection reused by the diff requests of a thread
+_local = threading.local()
+
+
+class ZenMoneyAPIError(Exception):
+    """Non-successful response from the ZenMoney API"""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Error: {status_code} {text}")
+        self.status_code = status_code
 
 
 class Instrument(BaseModel):
@@ -101,27 +121,32 @@ class ReminderMarker(BaseModel):
     tag: Optional[List[str]] = None
 
 
-class Transaction(BaseModel):
+class TransactionSummary(BaseModel):
+    """Transaction fields read when filtering operations and learning payees"""
+
     id: str
-    user: int
     date: str
     income: float
     outcome: float
     changed: int
     incomeInstrument: int
     outcomeInstrument: int
-    created: int
-    originalPayee: Optional[str] = None
     deleted: bool
-    viewed: bool
-    hold: Optional[bool] = None
-    qrCode: Optional[str] = None
-    source: Optional[str] = None
     incomeAccount: str
     outcomeAccount: Optional[str] = None
     tag: Optional[List[str]] = None
     comment: Optional[str] = None
     payee: Optional[str] = None
+    originalPayee: Optional[str] = None
+
+
+class Transaction(TransactionSummary):
+    user: int
+    created: int
+    viewed: bool
+    hold: Optional[bool] = None
+    qrCode: Optional[str] = None
+    source: Optional[str] = None
     opIncome: Optional[float] = None
     opOutcome: Optional[float] = None
     opIncomeInstrument: Optional[int] = None
@@ -134,10 +159,20 @@ class Transaction(BaseModel):
     reminderMarker: Optional[str] = None
 
 
-class ZenMoneyState(BaseModel):
+class ZenMoneyStateSummary(BaseModel):
+    """Diff decoded into the parts the import needs.
+
+    Budgets, reminders and markers are skipped, transactions keep only
+    the TransactionSummary fields.
+    """
+
     serverTimestamp: int
     instrument: List[Instrument]
     account: List[Account]
+    transaction: List[TransactionSummary]
+
+
+class ZenMoneyState(ZenMoneyStateSummary):
     budget: Optional[List[Budget]] = None
     reminder: Optional[List[Reminder]] = None
     reminderMarker: List[ReminderMarker]
@@ -158,52 +193,144 @@ class NewZenMoneyState(BaseModel):
     deletion: Optional[List[dict]] = None
 
 
-def get_state(days: int) -> ZenMoneyState:
-    currentTimestamp = int(datetime.today().timestamp())
-
-    serverTimestamp = int(
+def get_state(
+    days: int,
+    store: "ZenMoneyStateStore | None" = None,
+    full: bool = False,
+    api_key: str = ZEN_MONEY_API_KEY,
+    session: requests.Session | None = None,
+) -> ZenMoneyStateSummary:
+    """Download the ZenMoney diff for the last `days` days.
+
+    With a store, only the delta since its last sync is requested and
+    merged, and the whole stored state is returned. The response is
+    decoded into ZenMoneyStateSummary unless full models are requested.
+    A given session is used instead of the keep-alive one of the thread.
+    """
+    if store is not None:
+        sync_state(store, days, api_key, session)
+        return store.load(full=full)
+
+    if full:
+        return ZenMoneyState.model_validate_json(
+            _request_diff(_window_start(days), api_key, session)
+        )
+
+    return _read_summary(_stream_diff(_window_start(days), api_key, session))
+
+
+def sync_state(
+    store: "ZenMoneyStateStore",
+    days: int,
+    api_key: str = ZEN_MONEY_API_KEY,
+    session: requests.Session | None = None,
+) -> None:
+    """Bring the store up to date, covering at least the last `days` days"""
+    window_start = _window_start(days)
+
+    history_start = store.history_start
+    with metrics.stage("state_sync"):
+        if (
+            store.server_timestamp
+            and history_start is not None
+            and history_start <= window_start
+        ):
+            store.merge(_stream_diff(store.server_timestamp, api_key, session))
+        else:
+            # Store is empty or starts later than requested - load the window
+            store.merge(
+                _stream_diff(window_start, api_key, session), history_start=window_start
+            )
+
+
+def get_diff(
+    server_timestamp: int,
+    api_key: str = ZEN_MONEY_API_KEY,
+    session: requests.Session | None = None,
+) -> list[tuple[str, Any]]:
+    """Changes since server_timestamp as iter_diff_items pairs, for small deltas"""
+    with metrics.stage("state_sync"):
+        return list(_stream_diff(server_timestamp, api_key, session))
+
+
+def _window_start(days: int) -> int:
+    return int(
         (datetime.today() - timedelta(days=days))
         .replace(hour=0, minute=0, second=0, microsecond=0)
         .timestamp()
     )
 
-    r = requests.post(
-        "https://api.zenmoney.ru/v8/diff/",
-        headers={"Authorization": f"Bearer {ZEN_MONEY_API_KEY}"},
+
+def _read_summary(items: Iterable[tuple[str, Any]]) -> ZenMoneyStateSummary:
+    """Build ZenMoneyStateSummary from streamed diff items, one at a time"""
+    models = {
+        "instrument": Instrument,
+        "account": Account,
+        "transaction": TransactionSummary,
+    }
+    state: dict[str, Any] = {name: [] for name in models}
+
+    for name, value in items:
+        if name in models:
+            if value is not None:
+                state[name].append(models[name].model_validate(value))
+        elif name == "serverTimestamp":
+            state[name] = value
+
+    return ZenMoneyStateSummary.model_validate(state)
+
+
+def _request_diff(
+    serverTimestamp: int, api_key: str, session: requests.Session | None = None
+) -> bytes:
+    with _post_diff(serverTimestamp, api_key, session) as r:
+        content = r.content
+    metrics.count("state_sync", "bytes", len(content))
+    return content
+
+
+def _stream_diff(
+    serverTimestamp: int, api_key: str, session: requests.Session | None = None
+) -> Iterator[tuple[str, Any]]:
+    """Diff items decoded while the response is still being downloaded"""
+    with _post_diff(serverTimestamp, api_key, session) as r:
+        yield from iter_diff_items(_counted(r.iter_content(DIFF_CHUNK_SIZE)))
+
+
+def _counted(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    received = 0
+    try:
+        for chunk in chunks:
+            received += len(chunk)
+            yield chunk
+    finally:
+        metrics.count("state_sync", "bytes", received)
+
+
+def _post_diff(
+    serverTimestamp: int, api_key: str, session: requests.Session | None = None
+) -> requests.Response:
+    currentTimestamp = int(datetime.today().timestamp())
+
+    r = (session or _get_session()).post(
+        API_URL,
+        headers={"Authorization": f"Bearer {api_key}"},
         json={
             "currentClientTimestamp": currentTimestamp,
             "serverTimestamp": serverTimestamp,
         },
+        timeout=ZEN_MONEY_REQUEST_TIMEOUT,
+        stream=True,
     )
 
     if r.status_code != 200:
-        raise Exception(f"Error: {r.status_code} {r.text}")
-
-    return ZenMoneyState.model_validate(r.json())
-
-
-def update_state(state: NewZenMoneyState):
-    data = state.model_dump()
-
-    entity_fields = [
-        "instrument",
-        "account",
-        "budget",
-        "reminder",
-        "reminderMarker",
-        "deletion",
-    ]
-    for field in entity_fields:
-        if field in data and data[field] is None:
-            del data[field]
-
-    r = requests.post(
-        "https://api.zenmoney.ru/v8/diff/",
-        headers={"Authorization": f"Bearer {ZEN_MONEY_API_KEY}"},
-        json=data,
-    )
+        with r:
+            raise ZenMoneyAPIError(r.status_code, r.text)
+
+    return r
 
-    if r.status_code != 200:
-        raise Exception(f"Error updating state: {r.status_code} {r.text}")
 
-    return r.json()
+def _get_session() -> requests.Session:
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
@@ -0,0 +1,63 @@
+"""Synthetic statements and ZenMoney state for the stage benchmarks.
+
+Skipped by default; run with: pytest tests/benchmarks --benchmark-only
+Half of the operations are already in the generated ZenMoney state, so
+filtering drops some and keeps the rest. Nothing leaves the machine.
+"""
+
+import contextlib
+import io
+from dataclasses import dataclass
+
+import pytest
+from synthetic import generate_state, generate_statements, statement_xml
+
+from envs import CASH_WITHDRAWAL_CONFIG, CATEGORY_CONFIG, DEEL_CONFIG
+from services.emails_statements.statement import Statement
+from services.operations.filter import filter_operations
+from services.operations.preparer import prepare_operations
+from services.zen_money.state_index import ZenMoneyStateIndex
+from services.zen_money.zen_money_api import ZenMoneyStateSummary
+
+COUNTS = [1_000, 10_000, 100_000]
+CURRENCIES = ["RSD", "USD"]
+
+
+@dataclass
+class Workload:
+    """Input of every stage, prepared once per operation count"""
+
+    xmls: list[bytes]
+    statements: list[Statement]
+    operations: list
+    state: dict
+    zen_money_state: ZenMoneyStateSummary
+    state_index: ZenMoneyStateIndex
+    new_operations: list
+
+
+@pytest.fixture(scope="session", params=COUNTS, ids=str)
+def workload(request) -> Workload:
+    count = request.param
+    xmls = [
+        statement_xml(statement, currency)
+        for statement, currency in zip(generate_statements(count), CURRENCIES)
+    ]
+    statements = [Statement.from_xml(xml) for xml in xmls]
+    with contextlib.redirect_stdout(io.StringIO()):
+        operations = prepare_operations(
+            statements, DEEL_CONFIG, CASH_WITHDRAWAL_CONFIG, CATEGORY_CONFIG
+        )
+
+    state = generate_state(operations, transactions_count=count)
+    zen_money_state = ZenMoneyStateSummary.model_validate(state)
+    state_index = ZenMoneyStateIndex.from_state(zen_money_state)
+    return Workload(
+        xmls=xmls,
+        statements=statements,
+        operations=operations,
+        state=state,
+        zen_money_state=zen_money_state,
+        state_index=state_index,
+        new_operations=filter_operations(operations, zen_money_state, state_index),
+    )
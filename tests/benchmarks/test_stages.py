@@ -0,0 +1,73 @@
+import dataclasses
+import json
+
+from stubs import FakeIMAPClient, serve_zen_money
+from synthetic import statement_mail
+
+import plan
+from envs import CASH_WITHDRAWAL_CONFIG, CATEGORY_CONFIG, DEEL_CONFIG, DEFAULT_PROFILE
+from services.emails_statements import getter
+from services.emails_statements.statement import Statement
+from services.operations.filter import filter_operations
+from services.operations.preparer import prepare_operations
+from services.zen_money import zen_money_api
+from services.zen_money.preparer import prepare_new_state
+
+
+def test_from_xml(benchmark, workload):
+    statements = benchmark(lambda: [Statement.from_xml(xml) for xml in workload.xmls])
+
+    assert len(statements) == len(workload.statements)
+
+
+def test_prepare_operations(benchmark, workload):
+    operations = benchmark(
+        prepare_operations,
+        workload.statements,
+        DEEL_CONFIG,
+        CASH_WITHDRAWAL_CONFIG,
+        CATEGORY_CONFIG,
+    )
+
+    assert len(operations) == len(workload.operations)
+
+
+def test_filter_operations(benchmark, workload):
+    new_operations = benchmark(
+        filter_operations,
+        workload.operations,
+        workload.zen_money_state,
+        workload.state_index,
+    )
+
+    assert 0 < len(new_operations) < len(workload.operations)
+
+
+def test_prepare_new_state(benchmark, workload):
+    new_state = benchmark(prepare_new_state, workload.new_operations)
+
+    assert new_state.transaction
+
+
+def test_replay(benchmark, workload, monkeypatch, tmp_path_factory):
+    """Plan an import of the statements from scratch, the way `cli.py plan` does"""
+    messages = {uid: statement_mail(xml) for uid, xml in enumerate(workload.xmls, 1)}
+    body = json.dumps(workload.state, ensure_ascii=False).encode()
+
+    monkeypatch.setattr(
+        getter, "connect", lambda *credentials: FakeIMAPClient(messages)
+    )
+    url, server = serve_zen_money(lambda: [body])
+    monkeypatch.setattr(zen_money_api, "API_URL", url)
+
+    def replay():
+        # Пустой каталог: ни отметок почты, ни кэша выписок, ни копии состояния
+        directory = tmp_path_factory.mktemp("replay")
+        profile = dataclasses.replace(DEFAULT_PROFILE, storage_directory=directory)
+        return plan.create_plan(directory / "plan.ndjson", profile)
+
+    try:
+        benchmark(replay)
+    finally:
+        server.shutdown()
+        server.server_close()
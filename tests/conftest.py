@@ -0,0 +1,3 @@
+# Tests run against config.sample.yaml with a throwaway storage directory,
+# set up before any module reads envs
+import bench_config  # noqa: F401
@@ -0,0 +1,67 @@
+import dataclasses
+
+import pytest
+from stubs import FakeIMAPClient, serve_zen_money
+from synthetic import state_json_chunks
+
+import daemon
+from envs import DEFAULT_PROFILE
+from pipeline import fetch_and_prepare
+from services.zen_money import zen_money_api
+
+
+@pytest.fixture
+def profile(tmp_path):
+    return dataclasses.replace(DEFAULT_PROFILE, storage_directory=tmp_path)
+
+
+def failing_import(error: Exception):
+    def fetch_and_prepare(*args, **kwargs):
+        raise error
+
+    return fetch_and_prepare
+
+
+def import_new_mail(profile):
+    daemon.import_new_mail(
+        FakeIMAPClient({}), None, None, None, daemon.WarmState(profile), profile
+    )
+
+
+def test_import_error_keeps_daemon_running(monkeypatch, profile, capsys):
+    monkeypatch.setattr(daemon, "fetch_and_prepare", failing_import(KeyError("x")))
+
+    import_new_mail(profile)
+
+    assert "Импорт не удался" in capsys.readouterr().out
+
+
+def test_lost_imap_session_is_raised(monkeypatch, profile):
+    monkeypatch.setattr(
+        daemon, "fetch_and_prepare", failing_import(ConnectionResetError())
+    )
+
+    with pytest.raises(ConnectionResetError):
+        import_new_mail(profile)
+
+
+def test_state_refreshes_share_one_session(monkeypatch, profile):
+    url, server = serve_zen_money(lambda: state_json_chunks(5))
+    monkeypatch.setattr(zen_money_api, "API_URL", url)
+
+    def thread_session():
+        raise AssertionError("refresh used the session of its thread")
+
+    monkeypatch.setattr(zen_money_api, "_get_session", thread_session)
+    warm_state = daemon.WarmState(profile)
+    try:
+        for _ in range(3):
+            # Каждый вызов загружает состояние в новом потоке
+            _, zen_money_state = fetch_and_prepare(
+                7, statements=[], state_loader=warm_state.refresh, profile=profile
+            )
+            assert len(zen_money_state.transaction) == 5
+    finally:
+        warm_state.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from services.zen_money.diff_stream import DiffStreamError, iter_diff_items
+
+DIFF = {
+    "serverTimestamp": 1700000123,
+    "instrument": [
+        {"id": 2, "title": "Доллар США", "shortTitle": "USD", "rate": 97.5e-1},
+        {"id": 3, "title": "Динар", "shortTitle": "RSD", "rate": -0.125},
+    ],
+    "account": [],
+    "transaction": [
+        {
+            "id": 'a"b\\c',
+            "income": 0,
+            "outcome": 1234567.89,
+            "deleted": False,
+            "viewed": True,
+            "tag": None,
+            "comment": "Ref 😀 €",
+        },
+        None,
+        {"id": "e", "income": 1e21, "outcome": -7, "tag": ["x", "y"], "nested": {}},
+    ],
+    "deletion": None,
+    "flag": True,
+    "empty": {},
+}
+
+
+def diff_items(diff: dict) -> list[tuple]:
+    """Items iter_diff_items should yield, from json.loads"""
+    items = []
+    for key, value in diff.items():
+        if isinstance(value, list):
+            items += [(key, item) for item in value]
+        else:
+            items.append((key, value))
+    return items
+
+
+def chunked(body: bytes, size: int) -> list[bytes]:
+    return [body[start : start + size] for start in range(0, len(body), size)]
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_any_chunk_boundary_decodes_like_json_loads(indent):
+    body = json.dumps(DIFF, ensure_ascii=False, indent=indent).encode()
+    expected = diff_items(json.loads(body))
+
+    for size in range(1, len(body) + 1):
+        assert list(iter_diff_items(chunked(body, size))) == expected, size
+
+
+def test_long_body_is_decoded_across_buffer_compaction():
+    diff = {
+        "serverTimestamp": 1,
+        "transaction": [
+            {"id": str(i), "payee": "Плательщик " * 5} for i in range(5000)
+        ],
+    }
+    body = json.dumps(diff, ensure_ascii=False).encode()
+
+    assert list(iter_diff_items(chunked(body, 4093))) == diff_items(diff)
+
+
+def test_empty_object():
+    assert list(iter_diff_items([b" {", b" } "])) == []
+
+
+def test_truncated_body_raises():
+    body = json.dumps(DIFF, ensure_ascii=False).encode()
+
+    for end in range(len(body)):
+        with pytest.raises(DiffStreamError):
+            list(iter_diff_items(chunked(body[:end], 7)))
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'["serverTimestamp", 1]',
+        b'{"serverTimestamp" 1}',
+        b'{"serverTimestamp": 1 "account": []}',
+        b'{1: "serverTimestamp"}',
+        b'{"transaction": [{"id": "a"} {"id": "b"}]}',
+        b'{"transaction": [{"id": "a",]}',
+        b'{"serverTimestamp": tru}',
+        b'{"serverTimestamp": 1.2.3}',
+        b'{"comment": "\xff\xfe"}',
+    ],
+)
+def test_malformed_body_raises(body):
+    for size in (1, 3, len(body)):
+        with pytest.raises(DiffStreamError):
+            list(iter_diff_items(chunked(body, size)))
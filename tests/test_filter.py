@@ -0,0 +1,25 @@
+import uuid
+
+from synthetic import generate_state, generate_statements
+
+from envs import CASH_WITHDRAWAL_CONFIG, DEEL_CONFIG
+from services.operations.filter import filter_operations
+from services.operations.preparer import prepare_operations
+from services.zen_money.zen_money_api import ZenMoneyStateSummary
+
+
+def test_transactions_with_foreign_uuid5_ids_are_matched_by_key():
+    operations = prepare_operations(
+        generate_statements(200), DEEL_CONFIG, CASH_WITHDRAWAL_CONFIG
+    )
+    state = generate_state(operations, imported_ratio=1.0)
+
+    own_import_ids = {operation.import_id for operation in operations}
+    for number, transaction in enumerate(state["transaction"]):
+        # Импорт другой программой: тоже UUIDv5, но не наш
+        if transaction["id"] not in own_import_ids:
+            transaction["id"] = str(uuid.uuid5(uuid.NAMESPACE_URL, str(number)))
+
+    zen_money_state = ZenMoneyStateSummary.model_validate(state)
+
+    assert filter_operations(operations, zen_money_state) == []
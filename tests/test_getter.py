@@ -0,0 +1,42 @@
+from stubs import FakeIMAPClient
+
+from services.emails_statements.getter import SENDER, fetch_statements
+from services.emails_statements.watermark import UIDWatermarkStore
+
+
+class RecordingIMAPClient(FakeIMAPClient):
+    """Empty folder that remembers the search criteria"""
+
+    def __init__(self, folder_info: dict):
+        super().__init__({})
+        self.folder_info = folder_info
+        self.searches = []
+
+    def select_folder(self, folder: str, readonly: bool = False) -> dict:
+        return self.folder_info
+
+    def search(self, criteria) -> list[int]:
+        self.searches.append(criteria)
+        return []
+
+
+def run_twice(tmp_path, folder_info: dict) -> list[str]:
+    server = RecordingIMAPClient(folder_info)
+    for _ in range(2):
+        watermarks = UIDWatermarkStore(tmp_path)
+        assert fetch_statements(server, 7, watermarks) == []
+        watermarks.save()
+    return server.searches
+
+
+def test_empty_window_starts_after_newest_message(tmp_path):
+    searches = run_twice(tmp_path, {b"UIDVALIDITY": 1, b"UIDNEXT": 43})
+
+    assert searches[1] == f'(FROM "{SENDER}" UID 43:*)'
+
+
+def test_empty_window_without_uidnext_is_scanned_again(tmp_path):
+    searches = run_twice(tmp_path, {b"UIDVALIDITY": 1})
+
+    assert searches[0] == searches[1]
+    assert "SINCE" in searches[1]
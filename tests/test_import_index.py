@@ -0,0 +1,88 @@
+import uuid
+
+import pytest
+
+from services.zen_money import import_index as import_index_module
+from services.zen_money.import_index import ImportIndex
+
+
+def make_ids(start: int, count: int) -> list[str]:
+    return [str(uuid.uuid5(uuid.NAMESPACE_URL, str(i))) for i in range(start, count)]
+
+
+def stored_keys(directory) -> list[bytes]:
+    data = (directory / ImportIndex.KEYS_FILENAME).read_bytes()
+    return [data[offset : offset + 16] for offset in range(0, len(data), 16)]
+
+
+def test_ids_are_found_after_save_and_reopen(tmp_path):
+    imported, unknown = make_ids(0, 500), make_ids(500, 1500)
+
+    with ImportIndex(tmp_path) as index:
+        index.add(imported[:300])
+        # Pending ids are found before save
+        assert imported[0] in index
+        index.save()
+        index.add(imported[300:])
+        index.save()
+
+    with ImportIndex(tmp_path) as index:
+        assert len(index) == len(imported)
+        assert all(import_id in index for import_id in imported)
+        assert not any(import_id in index for import_id in unknown)
+
+    keys = stored_keys(tmp_path)
+    assert keys == sorted({uuid.UUID(import_id).bytes for import_id in imported})
+
+
+def test_saving_known_ids_again_keeps_one_key_each(tmp_path):
+    ids = make_ids(0, 100)
+
+    with ImportIndex(tmp_path) as index:
+        index.add(ids)
+        index.save()
+        index.add(ids[::2])
+        index.save()
+        assert len(index) == len(ids)
+
+
+def test_bloom_filter_is_rebuilt_when_it_outgrows_capacity(tmp_path):
+    capacity = import_index_module._Bloom.for_keys(0).capacity
+    first = make_ids(0, capacity - 100)
+    second = make_ids(capacity - 100, capacity + 500)
+
+    with ImportIndex(tmp_path) as index:
+        index.add(first)
+        index.save()
+        index.add(second)
+        index.save()
+
+    bloom = import_index_module._Bloom.load(tmp_path / ImportIndex.BLOOM_FILENAME)
+    assert bloom.capacity >= capacity + 500
+    with ImportIndex(tmp_path) as index:
+        # Ids from before the rebuild are in the new filter too
+        assert all(import_id in index for import_id in first + second)
+        assert not any(
+            import_id in index
+            for import_id in make_ids(capacity + 500, capacity + 1500)
+        )
+
+
+def test_missing_bloom_filter_is_rebuilt_from_keys(tmp_path):
+    ids = make_ids(0, 200)
+    with ImportIndex(tmp_path) as index:
+        index.add(ids)
+        index.save()
+    (tmp_path / ImportIndex.BLOOM_FILENAME).unlink()
+
+    with ImportIndex(tmp_path) as index:
+        assert all(import_id in index for import_id in ids)
+
+
+@pytest.mark.parametrize("import_id", ["", "42", "not-a-uuid", "ZM-1234567890"])
+def test_non_uuid_ids_are_not_found(tmp_path, import_id):
+    with ImportIndex(tmp_path) as index:
+        index.add(make_ids(0, 10))
+        index.save()
+
+        assert import_id not in index
@@ -0,0 +1,28 @@
+import pytest
+from synthetic import generate_statements, statement_mail, statement_xml
+
+import metrics
+from envs import EMAIL_ALLOWED_SUBJECTS
+from services.emails_statements.parsing import StatementParser, create_executor
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+def test_parse_metrics_are_recorded_in_the_parent(kind):
+    statements = generate_statements(100)
+    xmls = [statement_xml(statements[0], "RSD"), statement_xml(statements[1], "USD")]
+    metrics.reset()
+
+    with create_executor(2, kind) as executor:
+        parser = StatementParser(executor, EMAIL_ALLOWED_SUBJECTS)
+        for xml in xmls:
+            parser.add_message(statement_mail(xml))
+        parsed = list(parser.results())
+
+    summary = metrics.summary()
+    assert summary["mime_parse"]["calls"] == 2
+    assert summary["mime_parse"]["attachments"] == 2
+    assert summary["xml_parse"]["calls"] == 2
+    assert summary["xml_parse"]["bytes"] == sum(map(len, xmls))
+    assert summary["xml_parse"]["operations"] == sum(
+        len(statement.operations) for statement in parsed
+    )
@@ -0,0 +1,29 @@
+from synthetic import generate_state, generate_statements
+
+from envs import CASH_WITHDRAWAL_CONFIG, DEEL_CONFIG
+from pipeline import find_new_operations
+from services.operations.operations import SimpleOperation, make_import_id
+from services.operations.preparer import prepare_operations
+from services.zen_money.zen_money_api import ZenMoneyStateSummary
+
+
+def test_operations_without_raiffeisen_account_are_not_recorded():
+    operations = prepare_operations(
+        generate_statements(500, exchange_ratio=0), DEEL_CONFIG, CASH_WITHDRAWAL_CONFIG
+    )
+    # Операция в валюте без счета Raiffeisen в ZenMoney
+    foreign = SimpleOperation(
+        "AMAZON", -1000, "EUR", operations[0].date_ordinal, make_import_id("EUR", 1)
+    )
+    operations.append(foreign)
+    zen_money_state = ZenMoneyStateSummary.model_validate(
+        generate_state(operations[:-1])
+    )
+
+    new_operations, imported_ids = find_new_operations(operations, zen_money_state)
+
+    assert foreign not in new_operations
+    assert foreign.import_id not in imported_ids
+    assert set(imported_ids) == {
+        operation.import_id for operation in operations if operation is not foreign
+    }
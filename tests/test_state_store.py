@@ -0,0 +1,93 @@
+import pytest
+from synthetic import generate_state
+
+from services.zen_money import zen_money_api
+from services.zen_money.state_store import ZenMoneyStateStore, _diff_items
+from services.zen_money.zen_money_api import sync_state
+
+
+class FakeDiffAPI:
+    """Answers /v8/diff/ requests from a queue, remembering serverTimestamps"""
+
+    def __init__(self, monkeypatch):
+        self.responses: list[dict] = []
+        self.requested: list[int] = []
+        monkeypatch.setattr(zen_money_api, "_stream_diff", self.stream_diff)
+
+    def stream_diff(self, server_timestamp, api_key, session=None):
+        self.requested.append(server_timestamp)
+        return _diff_items(self.responses.pop(0))
+
+
+@pytest.fixture
+def store(tmp_path):
+    with ZenMoneyStateStore(tmp_path) as store:
+        yield store
+
+
+def test_window_then_delta_with_deletion(monkeypatch, store):
+    api = FakeDiffAPI(monkeypatch)
+    window = generate_state([], transactions_count=3)
+    first, second, third = window["transaction"]
+
+    api.responses.append({**window, "serverTimestamp": 100})
+    sync_state(store, 7)
+    window_start = api.requested[0]
+    assert store.history_start == window_start
+
+    changed = {**second, "comment": "Изменена", "changed": second["changed"] + 1}
+    added = {**first, "id": "ffffffff-0000-4000-8000-000000000000"}
+    api.responses.append(
+        {
+            "serverTimestamp": 200,
+            "transaction": [changed, added],
+            "deletion": [
+                {"id": first["id"], "object": "transaction", "stamp": 150, "user": 1}
+            ],
+        }
+    )
+    sync_state(store, 7)
+
+    # Окно уже загружено: запрашиваются только изменения с прошлой синхронизации
+    assert api.requested[1] == 100
+    state = store.load()
+    assert state.serverTimestamp == 200
+    assert len(state.instrument) == len(window["instrument"])
+    assert len(state.account) == len(window["account"])
+    transactions = {transaction.id: transaction for transaction in state.transaction}
+    assert set(transactions) == {second["id"], third["id"], added["id"]}
+    assert transactions[second["id"]].comment == "Изменена"
+
+    api.responses.append({"serverTimestamp": 300})
+    sync_state(store, 7)
+    assert api.requested[2] == 200
+    assert store.server_timestamp == 300
+
+
+def test_longer_window_extends_history(monkeypatch, store):
+    api = FakeDiffAPI(monkeypatch)
+
+    api.responses.append({"serverTimestamp": 100})
+    sync_state(store, 7)
+    api.responses.append({"serverTimestamp": 200})
+    sync_state(store, 30)
+
+    # Более длинное окно не покрыто копией - оно загружается целиком
+    short_window, long_window = api.requested
+    assert long_window < short_window
+    assert store.history_start == long_window
+
+    api.responses.append({"serverTimestamp": 300})
+    sync_state(store, 7)
+    assert api.requested[2] == 200
+
+    # Загрузка более короткого окна не сдвигает начало истории
+    store.merge({"serverTimestamp": 400}, history_start=short_window)
+    assert store.history_start == long_window
+
+
+def test_diff_without_server_timestamp_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.merge({"transaction": []})
+
+    assert store.server_timestamp is None
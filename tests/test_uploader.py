@@ -0,0 +1,146 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.zen_money import uploader as uploader_module
+from services.zen_money.uploader import BatchUploader
+from services.zen_money.zen_money_api import (
+    NewZenMoneyState,
+    Transaction,
+    ZenMoneyAPIError,
+)
+
+
+class ZenMoneyStub:
+    """Local /v8/diff/ answering POSTs with queued status codes, 200 when empty"""
+
+    def __init__(self):
+        self.status_codes: list[int] = []
+        self.received: list[dict] = []
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status_code = stub.status_codes.pop(0) if stub.status_codes else 200
+                if status_code == 200:
+                    stub.received.append(body)
+
+                response = json.dumps({"serverTimestamp": 1}).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._server.server_port}/v8/diff/"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def received_ids(self) -> list[list[str]]:
+        return [
+            [transaction["id"] for transaction in body.get("transaction", [])]
+            for body in self.received
+        ]
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def zen_money():
+    stub = ZenMoneyStub()
+    yield stub
+    stub.close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(uploader_module.time, "sleep", delays.append)
+    return delays
+
+
+def make_state(count: int, changed: int = 0) -> NewZenMoneyState:
+    return NewZenMoneyState(
+        currentClientTimestamp=changed,
+        serverTimestamp=0,
+        transaction=[
+            Transaction(
+                id=f"00000000-0000-5000-8000-{number:012d}",
+                user=1,
+                date="2024-01-01",
+                income=number + 1,
+                outcome=0,
+                changed=changed,
+                incomeInstrument=1,
+                outcomeInstrument=1,
+                created=changed,
+                deleted=False,
+                viewed=False,
+                incomeAccount="account",
+            )
+            for number in range(count)
+        ],
+    )
+
+
+def test_retries_throttled_and_failed_requests(zen_money, sleeps, tmp_path):
+    zen_money.status_codes = [429, 503]
+    uploader = BatchUploader(tmp_path, chunk_size=5, backoff=0.5, url=zen_money.url)
+
+    uploader.upload(make_state(12))
+    uploader.close()
+
+    assert [len(ids) for ids in zen_money.received_ids()] == [5, 5, 2]
+    assert sleeps == [0.5, 1.0]
+    # Загрузка завершена - журнал очищен
+    assert json.loads((tmp_path / BatchUploader.JOURNAL_FILENAME).read_text()) == []
+
+
+def test_gives_up_after_max_retries(zen_money, sleeps, tmp_path):
+    zen_money.status_codes = [503, 503, 503]
+    uploader = BatchUploader(tmp_path, max_retries=2, backoff=0.5, url=zen_money.url)
+
+    with pytest.raises(ZenMoneyAPIError) as error:
+        uploader.upload(make_state(3))
+    uploader.close()
+
+    assert error.value.status_code == 503
+    assert sleeps == [0.5, 1.0]
+    assert zen_money.received == []
+    assert zen_money.status_codes == []
+
+
+def test_resume_skips_accepted_transactions(zen_money, sleeps, tmp_path):
+    state = make_state(12)
+    ids = [transaction.id for transaction in state.transaction]
+
+    zen_money.status_codes = [200, 400]
+    uploader = BatchUploader(tmp_path, chunk_size=5, url=zen_money.url)
+    with pytest.raises(ZenMoneyAPIError):
+        uploader.upload(state)
+    uploader.close()
+    assert zen_money.received_ids() == [ids[:5]]
+
+    # Следующий запуск строит транзакции заново, в другом порядке и с другими
+    # отметками времени - границы пакетов сдвигаются
+    zen_money.received.clear()
+    rerun_state = make_state(12, changed=1)
+    rerun_state.transaction.reverse()
+    uploader = BatchUploader(tmp_path, chunk_size=5, url=zen_money.url)
+    uploader.upload(rerun_state)
+    uploader.close()
+
+    remaining = ids[5:][::-1]
+    assert zen_money.received_ids() == [remaining[:5], remaining[5:]]
+    assert json.loads((tmp_path / BatchUploader.JOURNAL_FILENAME).read_text()) == []